@@ -0,0 +1,305 @@
+# PyPlant benchmark suite
+#
+# Times the library's hot paths headlessly (nothing is drawn) over a range of
+# input sizes, prints each scaling curve with its fitted growth exponent, and
+# saves or compares JSON baselines:
+#
+#   python bench.py                          run everything, print results
+#   python bench.py --quick --only grid      small sizes, matching names only
+#   python bench.py --save base.json         record a baseline
+#   python bench.py --compare base.json --threshold 0.2
+#                                            exit 1 if anything is more than
+#                                            20% slower than the baseline
+#
+# Times are the best of several repeats, in seconds per call. Baselines are
+# only comparable when taken on the same machine.
+
+# Import
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'lib'))#adds lib folder to import directories
+
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import timeit
+import numpy as np
+
+from vectors import vec_branch, vecs_branch, vector
+from terrain import model, gridMesh, heightField, hillHeight, terrain_feature
+from renderers import nullRenderer
+from common import colorShade, gradient
+import seeds
+
+
+# Benchmarks ------------------------------------------------------------------
+# Each benchmark is (name, sizes, quick sizes, setup); setup(n) prepares the
+# inputs for size n and returns the function to time.
+
+def _branchInputs(n):
+    rng = np.random.RandomState(0)
+    parents = rng.randn(n,3)
+    return (parents, rng.uniform(0,np.pi/2,n), rng.uniform(0,2*np.pi,n),
+            rng.uniform(0.5,2,n))
+
+def bench_vec_branch(n):
+    parents, splits, rotations, lengths = _branchInputs(n)
+    vecs = [vector(tuple(p)) for p in parents]
+    def run():
+        for i in range(n):
+            vec_branch(vecs[i],splits[i],rotations[i],lengths[i])
+    return run
+
+def bench_vecs_branch(n):
+    inputs = _branchInputs(n)
+    return lambda: vecs_branch(*inputs)
+
+def _triangles(n):
+    rng = np.random.RandomState(1)
+    points = rng.randn(n,3,3)
+    return [tuple(vector(tuple(p)) for p in tri) for tri in points]
+
+def bench_triNorm(n):
+    tris = _triangles(n)
+    m = model(None, renderer=nullRenderer())
+    def run():
+        for tri in tris:
+            m.triNorm(tri)
+    return run
+
+def bench_addTriangle(n):
+    tris = _triangles(n)
+    def run():
+        m = model(None, renderer=nullRenderer())
+        for tri in tris:
+            m.addTriangle(tri)
+    return run
+
+def bench_gridMesh(n):
+    xlist = np.arange(n)*0.5
+    ygrid = np.zeros((n,n))
+    return lambda: gridMesh(None,xlist,xlist,ygrid,renderer=nullRenderer())
+
+def bench_heightField(n):
+    xlist = (np.arange(n)-n*0.5)*0.5
+    return lambda: heightField(hillHeight,xlist,xlist,8,0.2)
+
+def bench_terrain_feature(n):
+    return lambda: terrain_feature(None,n,0.5,hillHeight,8,0.2,
+                                   renderer=nullRenderer())
+
+_colors = [(0.4,0.2,0.1),(0.2,0.6,0.1),(0.9,0.9,0.3)]
+
+def bench_colorShade(n):
+    progress = np.linspace(0,1,n).tolist()
+    def run():
+        for p in progress:
+            colorShade(_colors,p)
+    return run
+
+def bench_gradient(n):
+    shade = gradient(_colors,256)
+    progress = np.linspace(0,1,n)
+    return lambda: shade(progress)
+
+def _seedData():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),'dat',
+                        'defaults.sdf')
+    return seeds.seedFile_read(path)
+
+def bench_seedFile_check(n):
+    data = [_seedData() for i in range(n)]
+    def run():
+        for d in data:
+            seeds.seedFile_check(d)
+    return run
+
+def bench_seedFile_checkAll(n):
+    data = [_seedData() for i in range(n)]
+    return lambda: seeds.seedFile_checkAll(data)
+
+_folders = []
+
+def _seedFolder(n):
+    """Make a temporary folder of n seed files, laid out for both
+        seedFile_load (which reads 'dat\\<name>.sdf' from the working folder)
+        and seedFile_bulkLoad; return it and the seed names.
+    """
+    folder = tempfile.mkdtemp(prefix='pyplant_bench_')
+    _folders.append(folder)
+    text = '\n'.join(_seedData())
+    names = ['seed%06d' % i for i in range(n)]
+    if os.sep == chr(92):
+        os.mkdir(os.path.join(folder,'dat'))
+    os.mkdir(os.path.join(folder,'bulk'))
+    for name in names:
+        for path in ('dat'+chr(92)+name+'.sdf',
+                     os.path.join('bulk',name+'.sdf')):
+            f = open(os.path.join(folder,path),'w')
+            f.write(text)
+            f.close()
+    return folder, names
+
+def bench_seedFile_load(n):
+    folder, names = _seedFolder(n)
+    def run():
+        seeds.seedFileCache.clear()
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            for name in names:
+                seeds.seedFile_load(name)
+        finally:
+            os.chdir(cwd)
+    return run
+
+def bench_seedFile_load_cached(n):
+    folder, names = _seedFolder(n)
+    seeds.seedFileCache.resize(max(n,256))
+    def run():
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            for name in names:
+                seeds.seedFile_load(name)
+        finally:
+            os.chdir(cwd)
+    return run
+
+def bench_seedFile_bulkLoad(n):
+    folder = _seedFolder(n)[0]
+    return lambda: seeds.seedFile_bulkLoad(os.path.join(folder,'bulk'))
+
+benchmarks = [
+    ('vec_branch', [10**2,10**3,10**4], [10**2,10**3], bench_vec_branch),
+    ('vecs_branch', [10**3,10**4,10**5,10**6], [10**3,10**4],
+     bench_vecs_branch),
+    ('model.triNorm', [10**2,10**3,10**4], [10**2,10**3], bench_triNorm),
+    ('model.addTriangle', [10**2,10**3,10**4], [10**2,10**3],
+     bench_addTriangle),
+    ('gridMesh', [16,32,64,128,256,512], [16,32,64], bench_gridMesh),
+    ('heightField', [16,32,64,128,256,512], [16,32,64], bench_heightField),
+    ('terrain_feature', [16,32,64,128,256], [16,32,64],
+     bench_terrain_feature),
+    ('colorShade', [10**2,10**3,10**4], [10**2,10**3], bench_colorShade),
+    ('gradient', [10**3,10**4,10**5,10**6], [10**3,10**4], bench_gradient),
+    ('seedFile_check', [10**2,10**3,10**4], [10**2,10**3],
+     bench_seedFile_check),
+    ('seedFile_checkAll', [10**2,10**3,10**4], [10**2,10**3],
+     bench_seedFile_checkAll),
+    ('seedFile_load', [10**2,10**3,10**4], [10**2,10**3],
+     bench_seedFile_load),
+    ('seedFile_load (cached)', [10**2,10**3,10**4], [10**2,10**3],
+     bench_seedFile_load_cached),
+    ('seedFile_bulkLoad', [10**2,10**3,10**4], [10**2,10**3],
+     bench_seedFile_bulkLoad),
+]
+
+
+# Timing ----------------------------------------------------------------------
+
+def timeCall(function, repeat=5, mintime=0.05):
+    """Return the best time of one call to function, in seconds. Fast
+        functions are looped so each timed run lasts at least mintime.
+    """
+    timer = timeit.default_timer
+    start = timer()
+    function()
+    first = timer()-start
+    loops = max(1, int(mintime/max(first,1e-9)))
+    best = first
+    for r in range(repeat):
+        start = timer()
+        for i in range(loops):
+            function()
+        best = min(best, (timer()-start)/loops)
+    return best
+
+def exponent(curve):
+    """Return the fitted power p of time ~ size**p for a scaling curve."""
+
+    sizes = sorted(curve, key=int)
+    if len(sizes)<2:
+        return None
+    x = np.log([float(n) for n in sizes])
+    y = np.log([max(curve[n],1e-12) for n in sizes])
+    return float(np.polyfit(x,y,1)[0])
+
+def runBenchmarks(only=None, quick=False, repeat=5, out=sys.stdout):
+    """Run the (matching) benchmarks; return {name: {size: seconds}}."""
+
+    results = {}
+    for name, sizes, quickSizes, setup in benchmarks:
+        if only and not any(o.lower() in name.lower() for o in only):
+            continue
+        curve = {}
+        for n in (quickSizes if quick else sizes):
+            curve[str(n)] = timeCall(setup(n), repeat)
+            out.write('%-24s %9d %12.6f s  %10.3g s/item\n'
+                      % (name, n, curve[str(n)], curve[str(n)]/n))
+            out.flush()
+        p = exponent(curve)
+        if p is not None:
+            out.write('%-24s scaling ~ n^%.2f\n' % (name, p))
+        results[name] = curve
+    return results
+
+def compare(results, baseline, threshold, out=sys.stdout):
+    """Report every time more than threshold (a fraction) slower than the
+        baseline; return the number of regressions.
+    """
+    regressions = 0
+    for name in sorted(results):
+        for n in sorted(results[name], key=int):
+            old = baseline.get(name,{}).get(n)
+            if old is None:
+                continue
+            ratio = results[name][n]/max(old,1e-12)
+            flag = ''
+            if ratio > 1+threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            out.write('%-24s %9s %7.2fx baseline%s\n' % (name,n,ratio,flag))
+    return regressions
+
+
+# Main ------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PyPlant benchmarks')
+    parser.add_argument('--only', nargs='*', help='benchmark name filters')
+    parser.add_argument('--quick', action='store_true',
+                        help='run small sizes only')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='write results to a JSON baseline')
+    parser.add_argument('--compare', help='compare with a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown before a regression is '
+                             'flagged, as a fraction (default 0.25)')
+    args = parser.parse_args(argv)
+
+    try:
+        results = runBenchmarks(args.only, args.quick, args.repeat)
+    finally:
+        for folder in _folders:
+            shutil.rmtree(folder, True)
+
+    if args.save:
+        f = open(args.save,'w')
+        json.dump({'machine': platform.platform(),
+                   'python': platform.python_version(),
+                   'numpy': np.__version__,
+                   'results': results}, f, indent=1, sort_keys=True)
+        f.close()
+    if args.compare:
+        f = open(args.compare)
+        baseline = json.load(f)['results']
+        f.close()
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# PyPlant equivalence checks
+#
+# Headless checks that the library's fast paths still give the same results
+# as the code they replaced:
+#
+#   vecs_branch         matches vec_branch for every row
+#   streamSkeleton      chunks match growSkeleton bit for bit
+#   seedFile_checkAll   agrees with seedFile_check on every file
+#
+#   python checks.py                run every check
+#   python checks.py --only stream  matching names only
+#
+# Exits 1 if any check fails. Nothing is drawn and no Visual is needed.
+
+# Import
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'lib'))#adds lib folder to import directories
+
+import argparse
+import numpy as np
+
+from vectors import vec_branch, vecs_branch, vector
+from growth import growSkeleton, streamSkeleton
+import seeds
+
+
+# Checks ----------------------------------------------------------------------
+# Each check is (name, function); the function returns a list of failure
+# messages (empty if the check passed).
+
+def _defaultSeed():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),'dat',
+                        'defaults.sdf')
+    return seeds.seedFile_read(path)
+
+def check_vecs_branch():
+    rng = np.random.RandomState(0)
+    n = 2000
+    parents = rng.randn(n,3)
+    #include parents on the axes, where direction() takes its special cases
+    parents[:6] = [(0,1,0),(0,-1,0),(1,0,0),(-1,0,0),(0,0,1),(0,0,-1)]
+    splits = rng.uniform(0,np.pi/2,n)
+    rotations = rng.uniform(0,2*np.pi,n)
+    lengths = rng.uniform(0.5,2,n)
+    batched = vecs_branch(parents,splits,rotations,lengths)
+    failures = []
+    for i in range(n):
+        single = tuple(vec_branch(vector(tuple(parents[i])),splits[i],
+                                  rotations[i],lengths[i]))
+        if not np.allclose(single, batched[i], rtol=1e-12, atol=1e-12):
+            failures.append('row %d: vec_branch %r, vecs_branch %r'
+                            % (i, single, tuple(batched[i])))
+    return failures[:5]
+
+def check_streamSkeleton():
+    data = _defaultSeed()
+    failures = []
+    #(steps, divs, divInc, chunksize, master)
+    cases = [(5,3,1,50,None), (5,3,1,50,7), (6,2,2,7,3), (30,1,0,4,None),
+             (4,5,0,1,1), (3,2,0,10**6,None)]
+    for steps, divs, divInc, chunksize, master in cases:
+        s = seeds.seed(data, None)
+        s.steps, s.divs, s.divInc = steps, divs, divInc
+        whole = growSkeleton(s, 'float64', master, 0)
+        chunks = list(streamSkeleton(s, chunksize, 'float64', master, 0))
+        case = 'steps=%d divs=%d divInc=%d chunksize=%d master=%r' % (
+            steps, divs, divInc, chunksize, master)
+        first = [c.first for c in chunks]
+        expected = list(np.cumsum([0]+[len(c) for c in chunks])[:-1])
+        if first != expected:
+            failures.append('%s: chunk rows %r, expected %r'
+                            % (case, first, expected))
+        for name in ('parent','depth','start','direction','length','width'):
+            streamed = np.concatenate([getattr(c,name) for c in chunks])
+            if not np.array_equal(streamed, getattr(whole,name)):
+                failures.append('%s: %s differs' % (case, name))
+    return failures
+
+def check_seedFile_checkAll():
+    good = _defaultSeed()
+    variants = [good, good[:20], good+[''], good[:5]+['']+good[6:],
+                good[:12]+['abc']+good[13:], good[:12]+['nan']+good[13:],
+                good[:1]+['1.5']+good[2:], good[:18]+['2.5']+good[19:],
+                good[:19]+['99']+good[20:], good[:3]+[' 0.2 ']+good[4:],
+                good[:11]+['1e-1']+good[12:]]
+    reports = seeds.seedFile_checkAll(variants)
+    failures = []
+    for n, (data, report) in enumerate(zip(variants, reports)):
+        if seeds.seedFile_check(data) != (report == []):
+            failures.append('file %d: seedFile_check %r, seedFile_checkAll %r'
+                            % (n, seeds.seedFile_check(data), report))
+    return failures
+
+checks = [
+    ('vecs_branch', check_vecs_branch),
+    ('streamSkeleton', check_streamSkeleton),
+    ('seedFile_checkAll', check_seedFile_checkAll),
+]
+
+
+# Main ------------------------------------------------------------------------
+
+def runChecks(only=None, out=sys.stdout):
+    """Run the (matching) checks, reporting each; return the number that
+        failed.
+    """
+    failed = 0
+    for name, check in checks:
+        if only and not any(o.lower() in name.lower() for o in only):
+            continue
+        failures = check()
+        out.write('%-24s %s\n' % (name, 'FAILED' if failures else 'ok'))
+        for message in failures:
+            out.write('    %s\n' % message)
+        out.flush()
+        failed += bool(failures)
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PyPlant equivalence checks')
+    parser.add_argument('--only', nargs='*', help='check name filters')
+    args = parser.parse_args(argv)
+    if runChecks(args.only):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+PyPlant 1.0
+LIBRARY: Branch Meshes
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Builds renderable models from plant skeletons. Every branch is an open
+cylinder placed from a cached unit-cylinder template, and all the branches of
+a plant are transformed in one batch, giving one merged mesh per seed colour
+band rather than one draw object per branch.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+from math import pi
+import numpy as np
+
+from terrain import model
+
+# ------------------------------------------------------------------------------
+"""
+The unit cylinder template runs from y=0 to y=1 with radius 1: a bottom ring
+of vertices followed by a top ring, with outward normals. A branch is placed
+by mapping the template's x, y and z axes onto two unit vectors perpendicular
+to the branch, and the branch direction, then scaling by radius and length.
+"""
+# ------------------------------------------------------------------------------
+
+#segments -> (cos table, sin table, ring y values, triangle indices)
+_templates = {}
+
+
+def cylinderTemplate(segments):
+    """Return the (cached) unit cylinder for the given number of sides, as
+        per-vertex cos, sin and y arrays plus its triangle index buffer.
+
+    cylinderTemplate(int) -> tuple<array<float>,array<float>,array<float>,
+                                   array<tuple<int,int,int>>>
+    Precondition: segments>2
+    """
+    if segments not in _templates:
+        angle = 2*pi*np.arange(segments)/segments
+        cos = np.tile(np.cos(angle), 2)
+        sin = np.tile(np.sin(angle), 2)
+        y = np.repeat([0., 1.], segments)
+
+        b0 = np.arange(segments)
+        b1 = (b0+1) % segments
+        t0 = b0 + segments
+        t1 = b1 + segments
+        tris = np.empty((segments,2,3), np.uint32)
+        tris[:,0] = np.column_stack((b0, t0, t1))
+        tris[:,1] = np.column_stack((b0, t1, b1))
+        _templates[segments] = (cos, sin, y, tris.reshape(-1,3))
+    return _templates[segments]
+
+
+def branchFrames(directions):
+    """Return two unit vectors perpendicular to each (unit) direction, and to
+        each other, as a pair of (N,3) arrays.
+
+    branchFrames(array<vector>) -> tuple<array<vector>,array<vector>>
+    """
+    directions = np.asarray(directions, float)
+    #cross with the x axis, or the z axis for near-x directions
+    ref = np.zeros(directions.shape)
+    nearX = np.abs(directions[:,0]) > 0.9
+    ref[~nearX,0] = 1.
+    ref[nearX,2] = 1.
+    a = np.cross(directions, ref)
+    a /= np.sqrt((a**2).sum(1))[:,None]
+    b = np.cross(a, directions)
+    return a, b
+
+
+class branchMesh(model):
+    """Specialisation of model: open cylinders for a set of plant branches,
+        merged into one mesh.
+
+    Constructor: branchMesh(display, color, int, boolean, renderer, dtype)
+    """
+
+    def __init__(self, window, color=(1,1,1), segments=6, clipping=True,
+                 renderer=None, dtype='float64'):
+        """Create an empty branch model with the given cylinder resolution."""
+
+        model.__init__(self, window, color, clipping, renderer, dtype)
+        self.segments = segments
+
+    def addBranches(self, sk, rows=None):
+        """Add a cylinder for every branch of the skeleton (or the selected
+            rows), with one batched transform of the template.
+
+        addBranches(skeleton, array<int> or array<boolean>) -> void
+        """
+        start, direction = sk.start, sk.direction
+        length, width = sk.length, sk.width
+        if rows is not None:
+            start, direction = start[rows], direction[rows]
+            length, width = length[rows], width[rows]
+        n = len(start)
+        if n==0:
+            return
+
+        cos, sin, y, tris = cylinderTemplate(self.segments)
+        a, b = branchFrames(direction)
+        #ring offsets (unit) for every branch vertex: (n, vertices, 3)
+        normals = (cos[None,:,None]*a[:,None,:]
+                   + sin[None,:,None]*b[:,None,:])
+        points = (start[:,None,:]
+                  + normals*(0.5*width)[:,None,None]
+                  + (y[None,:,None]*length[:,None,None])*direction[:,None,:])
+
+        verts = len(cos)
+        base = self._mesh.extend(points.reshape(-1,3), normals.reshape(-1,3),
+                                 self._col)
+        offsets = (np.arange(n, dtype=np.uint32)*verts)[:,None,None]
+        #back faces (if two-sided) are made when the mesh is drawn
+        self._mesh.extendFaces((tris[None,:,:] + offsets).reshape(-1,3), base)
+
+
+def colorBands(depth, generations, bands=3):
+    """Return the colour band (0 to bands-1) of each branch depth, splitting
+        the generations evenly from the first stem to the tips.
+
+    colorBands(array<int>, int, int) -> array<int>
+    """
+    return (np.asarray(depth, int)*bands)//generations
+
+
+def plantMeshes(window, s, sk, segments=6, shading=False, renderer=None,
+                dtype='float64'):
+    """Build and render the seed's plant skeleton as one branchMesh per seed
+        colour, the first colour for the lowest third of the generations and
+        the last for the tips.
+
+    plantMeshes(display, seed, skeleton, int, boolean, renderer, dtype)
+        -> list<branchMesh>
+    """
+    generations = int(sk.depth.max())+1
+    band = colorBands(sk.depth, generations, len(s.color))
+    meshes = []
+    for i in range(len(s.color)):
+        m = branchMesh(window, s.color[i], segments, True, renderer, dtype)
+        m.addBranches(sk, band==i)
+        m.render(shading)
+        meshes.append(m)
+    return meshes
+
+
+# ----------------------------------------------------------------------------
@@ -21,6 +21,7 @@ express permission. Commercial users must seek the permission of the author.
 """
 
 from math import pi
+import numpy as np
 
 # ------------------------------------------------------------------------------
 
@@ -61,7 +62,7 @@ def timeUnits(timeVal,unitIn,unitOut):
 
 
 def progressCurve(progress):
-    """Translate the decimal fraction progress to a point on the
+    """Translate the decimal fraction 'progress' to a point on the
         quadratic curve, -(x^2)+2x
 
     progressCurve(float) -> float
@@ -71,45 +72,61 @@ def progressCurve(progress):
 
 
 def colorShade(colors,progress):
-    """Takes a set of (R,G,B) colour values and decimal fraction progress.
+    """Takes a set of (R,G,B) colour values and decimal fraction 'progress'.
     Imagine colours are evenly shaded along a line; return the colour value
-    at the position indicated by progress.
+    at the position indicated by 'progress'.
 
     colorShade(list<color>,float) -> color
     preconditions:  0<=progress<=1
                     len(colors)>1
     """
-    k = progress
     n = len(colors)-1
-    fList=[]
-    newCol=(0,0,0)
-    
-    #Define linear functions for color shading strength around each point
-    for i in range(n+1):
-        
-        if i==0:
-            #First point function: downward-sloping line
-            fn = lambda x: max(0, 1 - n*x )
-            
-        elif i==n:
-            #Last point function: upward-sloping line
-            fn = lambda x: max(0, n*x - 1 )
-            
-        else:
-            #Other points: slopes ending at the adjoining points
-            fn = lambda x: max(0, 1 - n * abs(x - (i*1./n) ) )
-                ##f(x)=y = 1 - m| x-(i/m) |
-            
-        fList.append(fn)    
-    
-    #Generate the combined color: loop over each color value
-    for i in range(n+1):
-        #Add the value*strength to the output RGB components
-        newCol = ( newCol[0] + colors[i][0] * fList[i](k),
-                   newCol[1] + colors[i][1] * fList[i](k),
-                   newCol[2] + colors[i][2] * fList[i](k) ) 
-
-    return newCol
-    
+    pos = min(max(float(progress),0.),1.)*n
+    i = min(int(pos),n-1)
+    f = pos-i
+    #linear shading between the two neighbouring colours
+    return tuple([a*(1-f) + b*f for a,b in zip(colors[i],colors[i+1])])
+
+
+class gradient:
+    """A precompiled colour gradient: colours evenly spaced along 0..1, with
+    linear shading between neighbouring colours. Shades whole arrays of
+    progress values at once, optionally through a fixed-size lookup table.
+
+    Constructor: gradient(list<color>,int)
+    Class invariant: len(colors)>1
+                     resolution is None or resolution>1
+    """
+
+    def __init__(self,colors,resolution=None):
+        """Store the colours; build the lookup table if a resolution is
+        given."""
+        self._colors = np.asarray(colors,dtype=float).reshape(-1,3)
+        self._table = None
+        if resolution:
+            self._table = self._interpolate(np.linspace(0,1,resolution))
+
+    def _interpolate(self,progress):
+        """Return the exact shade for each progress value."""
+        n = len(self._colors)-1
+        pos = progress*n
+        i = np.minimum(np.floor(pos).astype(int),n-1)
+        f = (pos-i)[...,None]
+        return self._colors[i]*(1-f) + self._colors[i+1]*f
+
+    def shade(self,progress):
+        """Return the colour at each progress value (clipped to 0..1), as an
+        array with a trailing (R,G,B) axis: (N,3) for N values.
+
+        shade(array<float>) -> array<color>
+        """
+        progress = np.clip(np.asarray(progress,dtype=float),0,1)
+        if self._table is None:
+            return self._interpolate(progress)
+        last = len(self._table)-1
+        return self._table[np.rint(progress*last).astype(int)]
+
+    __call__ = shade
+
 
 # ----------------------------------------------------------------------------
@@ -0,0 +1,196 @@
+"""
+PyPlant 1.0
+LIBRARY: Population Evolution
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Evolves a population of seeds over many grow cycles. The population is a
+single matrix with one row per individual and one column per numeric seed
+field; mutation, range/integer constraints, plant statistics and selection
+are all applied to the whole matrix at once.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import numpy as np
+
+from seeds import dataTypes
+from common import cylinderVol, timeUnits
+
+# ------------------------------------------------------------------------------
+"""
+Population matrix layout: column n holds seed file line n+1 (see seeds.py),
+i.e. the 20 numeric fields in file order. Column limits and integer flags
+come straight from seeds.dataTypes.
+
+Each grow cycle, every individual's fields move by a normal random step of
+(MutatorFactor * field range) standard deviations - the mutator field itself
+included, so mutation rates evolve too - and are then clipped to range and
+rounded where the field is an integer.
+"""
+# ------------------------------------------------------------------------------
+
+#column numbers of the fields used by the statistics
+CYCLE, MUTATOR = 9, 10
+INILEN, INIWIDTH, INIANGLE = 11, 12, 13
+ROCLEN, ROCWIDTH, ROCANGLE = 14, 15, 16
+STEPS, DIVS, DIVINC = 17, 18, 19
+
+#per-column limits and integer flags
+isInt = np.array([t[0] for t in dataTypes[1:]])
+minVal = np.array([t[1] for t in dataTypes[1:]], float)
+maxVal = np.array([t[2] for t in dataTypes[1:]], float)
+
+
+def populationMatrix(seeds):
+    """Return the population matrix for a list of seeds.
+
+    populationMatrix(list<seed>) -> array<array<float>>
+    """
+    return np.array([s.values() for s in seeds], float)
+
+
+def randomPopulation(n, rng=None):
+    """Return a population of n individuals drawn uniformly from the valid
+        field ranges.
+
+    randomPopulation(int, RandomState) -> array<array<float>>
+    """
+    if rng is None:
+        rng = np.random
+    pop = minVal + rng.random_sample((n, len(minVal)))*(maxVal-minVal)
+    return constrain(pop)
+
+
+def constrain(pop):
+    """Clip every field to its range and round the integer fields, in place;
+        return the matrix.
+
+    constrain(array<array<float>>) -> array<array<float>>
+    """
+    np.clip(pop, minVal, maxVal, out=pop)
+    pop[:, isInt] = np.round(pop[:, isInt])
+    return pop
+
+
+def mutate(pop, rng=None):
+    """Return a mutated copy of the population (one grow cycle's change).
+
+    mutate(array<array<float>>, RandomState) -> array<array<float>>
+    """
+    if rng is None:
+        rng = np.random
+    step = rng.standard_normal(pop.shape)*(maxVal-minVal)
+    return constrain(pop + step*pop[:, MUTATOR:MUTATOR+1])
+
+
+def plantStats(pop):
+    """Return each individual's fully grown branch count, total branch length
+        and wood volume (the closed form of growth.skeletonStats).
+
+    plantStats(array<array<float>>) -> dict<string,array<float>>
+    """
+    n = len(pop)
+    count = np.ones(n)
+    branches = np.zeros(n)
+    length = np.zeros(n)
+    volume = np.zeros(n)
+    for d in range(int(maxVal[STEPS])+1):
+        grown = d <= pop[:, STEPS]
+        segLen = pop[:, INILEN]*(1+pop[:, ROCLEN])**d
+        segWidth = pop[:, INIWIDTH]*(1+pop[:, ROCWIDTH])**d
+        branches += np.where(grown, count, 0)
+        length += np.where(grown, count*segLen, 0)
+        volume += np.where(grown, count*cylinderVol(0.5*segWidth, segLen), 0)
+        count = count*(pop[:, DIVS] + pop[:, DIVINC]*d)
+    return {'branches': branches, 'length': length, 'volume': volume}
+
+
+def woodVolume(pop):
+    """Default fitness: wood volume of the fully grown plant.
+
+    woodVolume(array<array<float>>) -> array<float>
+    """
+    return plantStats(pop)['volume']
+
+
+class evolution:
+    """Simulates a population of seeds over successive grow cycles.
+
+    Each cycle the fittest fraction survives: the best elite individuals are
+    kept unchanged and the rest of the population is refilled with mutated
+    copies of random survivors.
+
+    Constructor: evolution(array<array<float>>, function, RandomState, float,
+                           float)
+    Class invariant: fitness takes a population matrix and returns one value
+                     per row (higher is fitter)
+    """
+
+    def __init__(self, population, fitness=woodVolume, rng=None,
+                 survival=0.5, elite=0.05):
+        """Start from the given population matrix."""
+
+        self.population = constrain(np.array(population, float))
+        self._fitness = fitness
+        self._rng = rng if rng is not None else np.random
+        self.survival = survival
+        self.elite = elite
+        self.cycle = 0
+        self.years = 0.
+        self.fitness = fitness(self.population)
+
+    def step(self):
+        """Run one grow cycle; return the statistics of the new generation.
+
+        step() -> dict
+        """
+        pop = self.population
+        n = len(pop)
+        order = np.argsort(-self.fitness)
+        survivors = order[:max(1, int(n*self.survival))]
+        elite = order[:int(n*self.elite)]
+
+        parents = survivors[self._rng.randint(0, len(survivors),
+                                              n-len(elite))]
+        self.population = np.vstack((pop[elite],
+                                     mutate(pop[parents], self._rng)))
+        self.fitness = self._fitness(self.population)
+        #a cycle lasts as long as the population's average grow cycle
+        self.years += timeUnits(pop[:, CYCLE].mean(), 's', 'y')
+        self.cycle += 1
+        return self.stats()
+
+    def run(self, cycles):
+        """Run several grow cycles; return the statistics of each.
+
+        run(int) -> list<dict>
+        """
+        return [self.step() for i in range(cycles)]
+
+    def stats(self):
+        """Return summary statistics of the current population: its cycle
+            number and elapsed years, fitness min/mean/max, and the mean of
+            every field.
+
+        stats() -> dict
+        """
+        fit = self.fitness
+        return {'cycle': self.cycle,
+                'years': self.years,
+                'fitnessMin': float(fit.min()),
+                'fitnessMean': float(fit.mean()),
+                'fitnessMax': float(fit.max()),
+                'fieldMeans': self.population.mean(0)}
+
+
+# ----------------------------------------------------------------------------
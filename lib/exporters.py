@@ -0,0 +1,299 @@
+"""
+PyPlant 1.0
+LIBRARY: Mesh Exporters
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Writes model geometry (mesh buffers) to files for faster offline renderers:
+binary PLY, OBJ, and glTF with a binary buffer. Meshes are streamed to disk
+in fixed-size chunks as they are added, so a scene of any size can be written
+with flat memory use.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+
+# ------------------------------------------------------------------------------
+"""
+Every writer has the same interface:
+    add(meshBuffer or model) -> void     append one mesh's geometry
+    close() -> void                      finish the file
+Triangles of later meshes are renumbered to follow earlier meshes' vertices.
+exportMeshes() picks the writer from the file extension.
+"""
+# ------------------------------------------------------------------------------
+
+CHUNK = 65536
+
+
+def _meshOf(obj):
+    """Return the mesh buffer of a model, or the mesh buffer itself, with
+        any flat normals and back faces made explicit (see meshBuffer).
+    """
+    if hasattr(obj, 'getMesh'):
+        obj = obj.getMesh()
+    return obj.resolved()
+
+
+def _empty(mesh):
+    """Return whether a mesh buffer has no vertices or no triangles (and so
+        nothing to export).
+    """
+    return len(mesh)==0 or mesh.faceCount()==0
+
+
+def _chunks(n, size):
+    """Yield slices covering range(n) in steps of size."""
+
+    for a in range(0, n, size):
+        yield slice(a, min(a+size, n))
+
+
+class plyWriter:
+    """Writes a binary little-endian PLY file: float position and normal,
+        byte colour per vertex, and triangle faces. Faces are spooled to a
+        temporary file until close(), as PLY stores every vertex first.
+
+    Constructor: plyWriter(string, int)
+    """
+
+    vertexType = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                           ('nx', '<f4'), ('ny', '<f4'), ('nz', '<f4'),
+                           ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+    faceType = np.dtype([('n', 'u1'), ('v', '<u4', (3,))])
+    #counts are written zero-padded to this width, then patched on close
+    COUNTWIDTH = 12
+
+    def __init__(self, filename, chunk=CHUNK):
+        """Open the file and write a header with placeholder counts."""
+
+        self._f = open(filename, 'wb')
+        self._faces = tempfile.TemporaryFile()
+        self._chunk = chunk
+        self.vertices = 0
+        self.triangles = 0
+        self._writeHeader()
+
+    def _writeHeader(self):
+        """Write the header at the start of the file."""
+
+        count = '%%0%dd' % self.COUNTWIDTH
+        header = ('ply\nformat binary_little_endian 1.0\n'
+                  'element vertex ' + count % self.vertices + '\n'
+                  'property float x\nproperty float y\nproperty float z\n'
+                  'property float nx\nproperty float ny\nproperty float nz\n'
+                  'property uchar red\nproperty uchar green\n'
+                  'property uchar blue\n'
+                  'element face ' + count % self.triangles + '\n'
+                  'property list uchar uint vertex_indices\nend_header\n')
+        self._f.seek(0)
+        self._f.write(header.encode('ascii'))
+
+    def add(self, mesh):
+        """Append a mesh's vertices to the file and its faces to the spool
+            (empty meshes are skipped).
+
+        add(meshBuffer or model) -> void
+        """
+        mesh = _meshOf(mesh)
+        if _empty(mesh):
+            return
+        pos, norm, col = mesh.positions(), mesh.normals(), mesh.colors()
+        for part in _chunks(len(mesh), self._chunk):
+            rows = np.empty(part.stop-part.start, self.vertexType)
+            rows['x'], rows['y'], rows['z'] = pos[part].T
+            rows['nx'], rows['ny'], rows['nz'] = norm[part].T
+            rgb = np.rint(np.clip(col[part], 0, 1)*255).astype('u1')
+            rows['red'], rows['green'], rows['blue'] = rgb.T
+            self._f.write(rows.tobytes())
+
+        tris = mesh.triangles()
+        for part in _chunks(len(tris), self._chunk):
+            rows = np.empty(part.stop-part.start, self.faceType)
+            rows['n'] = 3
+            rows['v'] = tris[part] + self.vertices
+            self._faces.write(rows.tobytes())
+
+        self.vertices += len(mesh)
+        self.triangles += len(tris)
+
+    def close(self):
+        """Copy the spooled faces after the vertices and fix the counts.
+
+        close() -> void
+        """
+        self._faces.seek(0)
+        shutil.copyfileobj(self._faces, self._f, 2**20)
+        self._faces.close()
+        self._writeHeader()
+        self._f.close()
+
+
+class objWriter:
+    """Writes a Wavefront OBJ file, with vertex colours appended to each
+        'v' line (a widely read extension) and a 'vn' normal per vertex.
+
+    Constructor: objWriter(string, int)
+    """
+
+    def __init__(self, filename, chunk=CHUNK):
+        """Open the file."""
+
+        self._f = open(filename, 'wb')
+        self._f.write(b'# PyPlant mesh export\n')
+        self._chunk = chunk
+        self.vertices = 0
+        self.triangles = 0
+
+    def add(self, mesh):
+        """Append a mesh's vertices, normals and faces as text (empty meshes
+            are skipped).
+
+        add(meshBuffer or model) -> void
+        """
+        mesh = _meshOf(mesh)
+        if _empty(mesh):
+            return
+        pos, norm, col = mesh.positions(), mesh.normals(), mesh.colors()
+        for part in _chunks(len(mesh), self._chunk):
+            np.savetxt(self._f, np.hstack((pos[part], col[part])),
+                       'v %.6g %.6g %.6g %.4g %.4g %.4g')
+            np.savetxt(self._f, norm[part], 'vn %.6g %.6g %.6g')
+
+        tris = mesh.triangles()
+        for part in _chunks(len(tris), self._chunk):
+            #OBJ indices are 1-based; vertex and normal share an index
+            idx = np.repeat(tris[part].astype(np.int64)
+                            + (self.vertices+1), 2, axis=1)
+            np.savetxt(self._f, idx, 'f %d//%d %d//%d %d//%d')
+
+        self.vertices += len(mesh)
+        self.triangles += len(tris)
+
+    def close(self):
+        """Close the file.
+
+        close() -> void
+        """
+        self._f.close()
+
+
+class gltfWriter:
+    """Writes a glTF 2.0 scene: a JSON .gltf file describing one mesh per
+        added mesh, and a .bin buffer (written as meshes are added) holding
+        float32 positions, normals and colours and uint32 indices.
+
+    Constructor: gltfWriter(string, int)
+    """
+
+    FLOAT, UINT = 5126, 5125
+    ARRAY, ELEMENTS = 34962, 34963
+
+    def __init__(self, filename, chunk=CHUNK):
+        """Open the binary buffer beside the given .gltf file name."""
+
+        self._filename = filename
+        self._binName = os.path.splitext(filename)[0] + '.bin'
+        self._bin = open(self._binName, 'wb')
+        self._chunk = chunk
+        self._offset = 0
+        self._doc = {'asset': {'version': '2.0', 'generator': 'PyPlant'},
+                     'scene': 0, 'scenes': [{'nodes': []}], 'nodes': [],
+                     'meshes': [], 'accessors': [], 'bufferViews': []}
+        self.vertices = 0
+        self.triangles = 0
+
+    def _view(self, data, dtype, target, accessorType, bounds=False):
+        """Stream an array to the buffer as a new bufferView and accessor;
+            return the accessor number.
+        """
+        start = self._offset
+        for part in _chunks(len(data), self._chunk):
+            block = np.ascontiguousarray(data[part], dtype).tobytes()
+            self._bin.write(block)
+            self._offset += len(block)
+        self._doc['bufferViews'].append({'buffer': 0, 'byteOffset': start,
+                                         'byteLength': self._offset-start,
+                                         'target': target})
+        accessor = {'bufferView': len(self._doc['bufferViews'])-1,
+                    'componentType': (self.UINT if dtype == '<u4'
+                                      else self.FLOAT),
+                    'count': int(data.size if accessorType == 'SCALAR'
+                                 else len(data)),
+                    'type': accessorType}
+        if bounds and len(data):
+            accessor['min'] = [float(v) for v in data.min(0)]
+            accessor['max'] = [float(v) for v in data.max(0)]
+        self._doc['accessors'].append(accessor)
+        return len(self._doc['accessors'])-1
+
+    def add(self, mesh):
+        """Append a mesh's arrays to the buffer and describe it as a mesh
+            (empty meshes are skipped).
+
+        add(meshBuffer or model) -> void
+        """
+        mesh = _meshOf(mesh)
+        if _empty(mesh):
+            return
+        attributes = {
+            'POSITION': self._view(mesh.positions(), '<f4', self.ARRAY,
+                                   'VEC3', True),
+            'NORMAL': self._view(mesh.normals(), '<f4', self.ARRAY, 'VEC3'),
+            'COLOR_0': self._view(mesh.colors(), '<f4', self.ARRAY, 'VEC3')}
+        indices = self._view(mesh.triangles().reshape(-1), '<u4',
+                             self.ELEMENTS, 'SCALAR')
+        self._doc['meshes'].append({'primitives': [
+            {'attributes': attributes, 'indices': indices, 'mode': 4}]})
+        self._doc['nodes'].append({'mesh': len(self._doc['meshes'])-1})
+        self._doc['scenes'][0]['nodes'].append(len(self._doc['nodes'])-1)
+        self.vertices += len(mesh)
+        self.triangles += mesh.faceCount()
+
+    def close(self):
+        """Close the buffer and write the JSON description.
+
+        close() -> void
+        """
+        self._bin.close()
+        if self._offset:            #a buffer may not be empty
+            self._doc['buffers'] = [{'uri': os.path.basename(self._binName),
+                                     'byteLength': self._offset}]
+        f = open(self._filename, 'w')
+        json.dump(self._doc, f)
+        f.close()
+
+
+writers = {'.ply': plyWriter, '.obj': objWriter, '.gltf': gltfWriter}
+
+
+def exportMeshes(filename, meshes, chunk=CHUNK):
+    """Write meshes (an iterable of models or mesh buffers, which may be a
+        generator) to one file, in the format given by its extension:
+        .ply, .obj or .gltf. Return (vertex count, triangle count).
+
+    exportMeshes(string, iterable<model or meshBuffer>, int)
+        -> tuple<int,int>
+    """
+    writer = writers[os.path.splitext(filename)[1].lower()](filename, chunk)
+    for mesh in meshes:
+        writer.add(mesh)
+    writer.close()
+    return writer.vertices, writer.triangles
+
+
+# ----------------------------------------------------------------------------
@@ -0,0 +1,347 @@
+"""
+PyPlant 1.0
+LIBRARY: Plant Growth
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Grows the branch hierarchy described by a seed. Branches are not individual
+objects: a plant skeleton is a set of flat typed arrays with one row per
+branch, and each generation of branches is produced from the previous one
+with array operations. Plants too large to hold in memory can be streamed
+breadth-first in fixed-size chunks instead.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+from math import pi, radians
+import numpy as np
+
+from vectors import vecs_branch
+from streams import uniform, PLANT
+from common import cylinderVol
+
+# ------------------------------------------------------------------------------
+"""
+Growth rules, for a branch at depth d (the first stem has depth 0):
+    length      = iniLen   * (1+rocLen)**d
+    width       = iniWidth * (1+rocWidth)**d
+    split angle = iniAngle * (1+rocAngle)**d        (degrees in the seed)
+    children    = divs + divInc*d                  (for d < steps)
+Children start at their parent's tip and are spread evenly around it
+(rotation 2*pi*k/children), offset by the golden angle each generation so
+siblings of successive generations do not line up. A seed therefore grows
+steps+1 generations of branches.
+
+Given a master seed (see streams.py), each child's length is also varied by
+up to +/-mutator of itself, and its rotation by up to +/-mutator of half the
+gap to its siblings. The variation is keyed by (master, plant number, row),
+so a plant grows identically whole, streamed in any chunk size, or on any
+process.
+"""
+# ------------------------------------------------------------------------------
+
+#golden angle (radians): rotation offset between generations
+GOLDEN = pi*(3-5**0.5)
+
+
+def seedParams(s):
+    """Return the seed's growth parameters as numbers, in the order
+        (iniLen, iniWidth, iniAngle, rocLen, rocWidth, rocAngle,
+         steps, divs, divInc, mutator)
+
+    seedParams(seed) -> tuple
+    """
+    return (s.iniLen, s.iniWidth, s.iniAngle, s.rocLen, s.rocWidth,
+            s.rocAngle, s.steps, s.divs, s.divInc, s.mutator)
+
+
+def generationSizes(s):
+    """Return the number of branches in each generation grown from the seed.
+
+    generationSizes(seed) -> list<int>
+    """
+    steps, divs, divInc = seedParams(s)[6:9]
+    sizes = [1]
+    for d in range(steps):
+        sizes.append(sizes[-1]*(divs+divInc*d))
+    return sizes
+
+
+class skeleton:
+    """A plant's branches as structure-of-arrays, in generation order: row 0
+        is the first stem, and every branch's parent has a lower row number.
+        A skeleton may also be one chunk of a streamed plant, holding rows
+        first to first+len-1 of the whole plant.
+
+    Constructor: skeleton(int, dtype)
+
+    Arrays (one row per branch):
+        parent      int64       plant row of the parent (-1 for the stem)
+        depth       uint8       generation number
+        start       (n,3) float base position
+        direction   (n,3) float unit direction
+        length      float
+        width       float
+    """
+
+    def __init__(self, count, dtype='float64'):
+        """Allocate arrays for count branches."""
+
+        dtype = np.dtype(dtype)
+        self.first = 0
+        self.parent = np.empty(count, np.int64)
+        self.depth = np.empty(count, np.uint8)
+        self.start = np.empty((count,3), dtype)
+        self.direction = np.empty((count,3), dtype)
+        self.length = np.empty(count, dtype)
+        self.width = np.empty(count, dtype)
+
+    def __len__(self):
+        """Return the number of branches."""
+
+        return len(self.parent)
+
+    @staticmethod
+    def bytesPerBranch(dtype='float64'):
+        """Return the memory used by each branch row, in bytes.
+
+        bytesPerBranch(dtype) -> int
+        """
+        return 8 + 1 + 8*np.dtype(dtype).itemsize
+
+    def nbytes(self):
+        """Return the memory used by the arrays, in bytes.
+
+        nbytes() -> int
+        """
+        return len(self)*self.bytesPerBranch(self.start.dtype)
+
+    def ends(self):
+        """Return the tip position of every branch.
+
+        ends() -> array<vector>
+        """
+        return self.start + self.direction*self.length[:,None]
+
+
+def growChildren(directions, tips, depth, params, variation=None):
+    """Grow one generation: return (parentRows, start, direction, length,
+        width) arrays for the children of the given parent branches.
+        parentRows (int64, so offsetting them to plant rows cannot wrap)
+        index into the given arrays. variation is None, or
+        (master, plant, row) where row is the plant row of the first child.
+
+    growChildren(array<vector>,array<vector>,int,tuple,tuple<int,int,int>)
+        -> tuple<array<int>,array<vector>,array<vector>,array<float>,
+                 array<float>>
+    Precondition: depth>0 (the depth of the children)
+    """
+    iniLen, iniWidth, iniAngle, rocLen, rocWidth, rocAngle = params[:6]
+    divs, divInc = params[7], params[8]
+    k = divs + divInc*(depth-1)
+    parents = len(directions)
+
+    length = iniLen*(1+rocLen)**depth
+    width = iniWidth*(1+rocWidth)**depth
+    split = radians(iniAngle*(1+rocAngle)**depth)
+    rotation = 2*pi*np.arange(k)/k + GOLDEN*depth
+
+    rows = np.repeat(np.arange(parents, dtype=np.int64), k)
+    length = np.full(len(rows), length)
+    rotation = np.tile(rotation, parents)
+    if variation is not None:
+        master, plant, first = variation
+        ids = first + np.arange(len(rows), dtype=np.int64)
+        mutator = params[9]
+        length *= 1 + mutator*(2*uniform(master, PLANT, plant, ids, 0)-1)
+        rotation += (pi/k)*mutator*(2*uniform(master, PLANT, plant, ids, 1)-1)
+
+    vecs = vecs_branch(directions[rows], split, rotation, length)
+    return (rows, tips[rows], vecs/length[:,None], length,
+            np.full(len(rows), width))
+
+
+def growSkeleton(s, dtype='float64', master=None, plant=0):
+    """Grow the whole branch hierarchy for the seed, with branch variation if
+        a master seed is given. Memory use is
+        sum(generationSizes(s)) * skeleton.bytesPerBranch(dtype).
+
+    growSkeleton(seed, dtype, int, int) -> skeleton
+    """
+    params = seedParams(s)
+    sizes = generationSizes(s)
+    sk = skeleton(sum(sizes), dtype)
+
+    #the first stem: straight up from the origin
+    sk.parent[0] = -1
+    sk.depth[0] = 0
+    sk.start[0] = (0, 0, 0)
+    sk.direction[0] = (0, 1, 0)
+    sk.length[0] = params[0]
+    sk.width[0] = params[1]
+
+    first, end = 0, 1
+    for depth in range(1, len(sizes)):
+        tips = (sk.start[first:end]
+                + sk.direction[first:end]*sk.length[first:end,None])
+        variation = None
+        if master is not None:
+            variation = (master, plant, end)
+        rows, start, direction, length, width = growChildren(
+            sk.direction[first:end], tips, depth, params, variation)
+        new = slice(end, end+len(rows))
+        sk.parent[new] = rows + first
+        sk.depth[new] = depth
+        sk.start[new] = start
+        sk.direction[new] = direction
+        sk.length[new] = length
+        sk.width[new] = width
+        first, end = end, end+len(rows)
+    return sk
+
+
+def _stem(params, dtype):
+    """Return the one-row skeleton holding the first stem."""
+
+    sk = skeleton(1, dtype)
+    sk.parent[0] = -1
+    sk.depth[0] = 0
+    sk.start[0] = (0, 0, 0)
+    sk.direction[0] = (0, 1, 0)
+    sk.length[0] = params[0]
+    sk.width[0] = params[1]
+    return sk
+
+
+def _generationChunks(params, sizes, depth, chunksize, dtype, master, plant,
+                      kept=None):
+    """Yield generation depth's branches as skeleton chunks of chunksize rows
+        (the last may be shorter). The parent generation is taken from kept
+        (depth -> its one chunk) if there, else regrown chunk by chunk, so
+        memory is bounded by one chunk per generation besides those kept.
+    """
+    if kept is not None and depth in kept:
+        yield kept[depth]
+        return
+    if depth == 0:
+        yield _stem(params, dtype)
+        return
+
+    offset = sum(sizes[:depth])
+    parentOffset = offset - sizes[depth-1]
+    k = params[7] + params[8]*(depth-1)
+    parentsPer = max(1, chunksize//k)
+    pending = []
+    pendingRows = 0
+    done = 0
+
+    for parents in _generationChunks(params, sizes, depth-1, chunksize,
+                                     dtype, master, plant, kept):
+        for a in range(0, len(parents), parentsPer):
+            part = slice(a, a+parentsPer)
+            tips = (parents.start[part]
+                    + parents.direction[part]*parents.length[part,None])
+            variation = None
+            if master is not None:
+                variation = (master, plant,
+                             offset + (parents.first+a-parentOffset)*k)
+            grown = growChildren(parents.direction[part], tips, depth,
+                                 params, variation)
+            pending.append((grown[0] + parents.first + a,) + grown[1:])
+            pendingRows += len(grown[0])
+
+            while pendingRows >= chunksize:
+                chunk, pending = _takeRows(pending, chunksize)
+                pendingRows -= chunksize
+                yield _chunk(chunk, depth, offset+done, dtype)
+                done += chunksize
+
+    if pendingRows:
+        chunk, pending = _takeRows(pending, pendingRows)
+        yield _chunk(chunk, depth, offset+done, dtype)
+
+
+def _takeRows(pieces, n):
+    """Split n rows off the front of a list of (parent, start, direction,
+        length, width) array tuples; return (taken, remaining pieces).
+    """
+    joined = [np.concatenate(field) for field in zip(*pieces)]
+    taken = [field[:n] for field in joined]
+    rest = [field[n:] for field in joined]
+    if len(rest[0]):
+        return taken, [tuple(rest)]
+    return taken, []
+
+
+def _chunk(fields, depth, first, dtype):
+    """Wrap (parent, start, direction, length, width) arrays as a skeleton
+        chunk beginning at plant row first.
+    """
+    sk = skeleton(len(fields[0]), dtype)
+    sk.first = first
+    sk.parent[:] = fields[0]
+    sk.depth[:] = depth
+    sk.start[:] = fields[1]
+    sk.direction[:] = fields[2]
+    sk.length[:] = fields[3]
+    sk.width[:] = fields[4]
+    return sk
+
+
+def streamSkeleton(s, chunksize=65536, dtype='float64', master=None,
+                   plant=0):
+    """Grow the seed's branch hierarchy breadth-first, yielding skeleton
+        chunks of at most chunksize rows, generation by generation. Rows and
+        parent rows are numbered as in growSkeleton(s).
+
+    Generations that fit in one chunk are kept, to grow their children
+    from; of the rest, only one chunk per generation is held at a time, so
+    memory stays bounded however large the plant. The price is that larger
+    generations are regrown for each later one. That at most doubles the
+    work: once a generation outgrows a chunk, each later one is at least
+    twice its size (divs+divInc*depth>=2), so it is larger than all the
+    regrown generations before it.
+
+    streamSkeleton(seed, int, dtype, int, int) -> generator<skeleton>
+    """
+    params = seedParams(s)
+    sizes = generationSizes(s)
+    kept = {}
+    for depth in range(len(sizes)):
+        for chunk in _generationChunks(params, sizes, depth, chunksize,
+                                       dtype, master, plant, kept):
+            if len(chunk) == sizes[depth]:
+                #keep a copy, safe from changes made by the caller
+                kept[depth] = _chunk((chunk.parent, chunk.start,
+                                      chunk.direction, chunk.length,
+                                      chunk.width), depth, chunk.first, dtype)
+            yield chunk
+
+
+def skeletonStats(chunks):
+    """Consume skeleton chunks (or a list holding one whole skeleton); return
+        the total branch count, length and wood volume.
+
+    skeletonStats(iterable<skeleton>) -> dict
+    """
+    branches = 0
+    length = 0.
+    volume = 0.
+    for chunk in chunks:
+        branches += len(chunk)
+        length += float(chunk.length.sum(dtype=np.float64))
+        volume += float(cylinderVol(0.5*chunk.width.astype(np.float64),
+                                    chunk.length).sum())
+    return {'branches': branches, 'length': length, 'volume': volume}
+
+
+# ----------------------------------------------------------------------------
@@ -0,0 +1,244 @@
+"""
+PyPlant 1.0
+LIBRARY: Instrumentation
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Opt-in timing and counting of the library's hot paths. Modules register
+probes on their functions and methods; while instrumentation is disabled
+(the default) nothing is wrapped, so it costs nothing. enable() swaps timing
+wrappers in, which record calls and time per phase plus primitive counters
+(triangles, vertices, seeds parsed, cache hits...), and can also run the
+standard profiler for export to pstats.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import cProfile
+import pstats
+import threading
+from timeit import default_timer as _timer
+
+# ------------------------------------------------------------------------------
+"""
+A probe names a function or method and the phase its time is charged to:
+    probe(globals(), 'heightField', 'height')            module function
+    probe(model, 'addTriangle', 'addTriangle', counts)   method
+counts, if given, is called as counts(result, *args) after each call and
+returns a dict of counter increments.
+Phase times are 'total' (including probed calls made inside it) and 'self'
+(excluding them). Each thread keeps its own stack of probed calls, so
+probes may run on several threads at once (e.g. seedFile_bulkLoad's pool);
+their times and counts are added up under a lock. Wrappers are installed on the module or class, so names
+copied out with 'from module import name' before enable() are not timed.
+"""
+# ------------------------------------------------------------------------------
+
+enabled = False
+
+_probes = []        #(owner, name, phase, counts)
+_installed = []     #(owner, name, original function)
+_phases = {}        #phase -> [calls, total time, self time]
+_counters = {}      #counter -> count
+_local = threading.local()  #.stack: time spent in probed calls, per active
+                            #probed call of this thread
+_lock = threading.Lock()    #guards _phases and _counters
+_profiler = None
+
+
+def _stack():
+    """Return this thread's stack of active probed calls."""
+
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def _get(owner, name):
+    """Return the function stored under name in a module dict or class."""
+
+    if isinstance(owner, dict):
+        return owner[name]
+    return owner.__dict__[name]
+
+
+def _set(owner, name, function):
+    """Store a function under name in a module dict or class."""
+
+    if isinstance(owner, dict):
+        owner[name] = function
+    else:
+        setattr(owner, name, function)
+
+
+def _wrap(function, phase, counts):
+    """Return a timing wrapper for function."""
+
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        stack.append(0.)
+        start = _timer()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            elapsed = _timer()-start
+            inner = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with _lock:
+                stats = _phases.setdefault(phase, [0, 0., 0.])
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] += elapsed-inner
+        if counts is not None:
+            increments = counts(result, *args, **kwargs)
+            with _lock:
+                for name, n in increments.items():
+                    _counters[name] = _counters.get(name, 0) + n
+        return result
+
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+
+def _install(owner, name, phase, counts):
+    """Swap the timing wrapper in for one probe."""
+
+    original = _get(owner, name)
+    _set(owner, name, _wrap(original, phase, counts))
+    _installed.append((owner, name, original))
+
+
+def probe(owner, name, phase=None, counts=None):
+    """Register a function (in a module's globals()) or method (in a class)
+        to be timed under phase (default: its name) while enabled.
+
+    probe(dict or class, string, string, function) -> void
+    """
+    if phase is None:
+        phase = name
+    _probes.append((owner, name, phase, counts))
+    if enabled:
+        _install(owner, name, phase, counts)
+
+
+def count(name, n=1):
+    """Add n to a counter, if instrumentation is enabled.
+
+    count(string, int) -> void
+    """
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def enable(profile=False):
+    """Start timing every probe; with profile, also run cProfile over
+        everything until disable().
+
+    enable(boolean) -> void
+    """
+    global enabled, _profiler
+    if not enabled:
+        enabled = True
+        for p in _probes:
+            _install(*p)
+    if profile and _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def disable():
+    """Stop timing and profiling, restoring the original functions. The
+        gathered statistics are kept until reset().
+
+    disable() -> void
+    """
+    global enabled
+    enabled = False
+    while _installed:
+        owner, name, original = _installed.pop()
+        _set(owner, name, original)
+    if _profiler is not None:
+        _profiler.disable()
+
+
+def reset():
+    """Clear the gathered statistics and any profile.
+
+    reset() -> void
+    """
+    global _profiler
+    with _lock:
+        _phases.clear()
+        _counters.clear()
+    if _profiler is not None and not enabled:
+        _profiler = None
+    elif _profiler is not None:
+        _profiler.disable()
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def report():
+    """Return the gathered statistics: per phase, its call count and total
+        and self time in seconds; and every counter.
+
+    report() -> dict<string,dict>
+    """
+    phases = {}
+    with _lock:
+        for phase, (calls, total, own) in _phases.items():
+            phases[phase] = {'calls': calls, 'total': total, 'self': own}
+        counters = dict(_counters)
+    return {'phases': phases, 'counters': counters}
+
+
+def formatReport():
+    """Return the statistics as a text table, slowest phases first.
+
+    formatReport() -> string
+    """
+    stats = report()
+    lines = ['%-24s %10s %12s %12s' % ('phase', 'calls', 'total (s)',
+                                       'self (s)')]
+    for phase, s in sorted(stats['phases'].items(),
+                           key=lambda item: -item[1]['total']):
+        lines.append('%-24s %10d %12.6f %12.6f'
+                     % (phase, s['calls'], s['total'], s['self']))
+    lines.append('')
+    lines.append('%-24s %10s' % ('counter', 'count'))
+    for name in sorted(stats['counters']):
+        lines.append('%-24s %10d' % (name, stats['counters'][name]))
+    return '\n'.join(lines)
+
+
+def profileStats(filename=None):
+    """Return the profile taken since enable(profile=True) as pstats.Stats,
+        also saving it to filename if given (for pstats, snakeviz etc.).
+
+    profileStats(string) -> pstats.Stats or None
+    """
+    if _profiler is None:
+        return None
+    if filename is not None:
+        _profiler.dump_stats(filename)
+    stats = pstats.Stats(_profiler)
+    if enabled:
+        _profiler.enable()   #taking the stats stops the profiler
+    return stats
+
+
+# ----------------------------------------------------------------------------
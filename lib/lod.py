@@ -0,0 +1,380 @@
+"""
+PyPlant 1.0
+LIBRARY: Plant Level of Detail
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Distance-based level of detail for plants. Each plant can be built at several
+detail levels, with fewer cylinder sides and its deepest generations of twigs
+replaced by crown impostors: one low-polygon ellipsoid per clump of dropped
+twigs. A forest picks each plant's level from its distance to the camera, and
+can coarsen the furthest plants further to stay within a triangle budget, so
+its cost stays roughly constant however many plants it holds.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+from math import pi
+import numpy as np
+
+from terrain import model
+from branches import branchMesh, colorBands
+from growth import growSkeleton
+from renderers import nullRenderer
+
+# ------------------------------------------------------------------------------
+"""
+A detail level is (cylinder sides, generations dropped). Level 0 is the
+finest. Dropping n generations removes every branch deeper than the plant's
+deepest generation minus n (the first stem is always kept). Dropped twigs are
+grouped by the kept branch they grow from, and each group is replaced by an
+ellipsoid bounding its twigs, in the seed's last (tip) colour.
+A plant at distance d from the camera uses level 0 within loddistance, and
+one level coarser for each doubling of distance beyond it (as tiles.py does).
+"""
+# ------------------------------------------------------------------------------
+
+detailLevels = [(8, 0), (6, 1), (4, 2), (3, 3)]
+
+#(segments, rings) -> (unit sphere points, triangle indices)
+_crowns = {}
+
+
+def crownTemplate(segments=6, rings=3):
+    """Return the (cached) low-polygon unit sphere used for crown impostors:
+        its points (which are also its normals) and triangle indices, wound
+        outwards.
+
+    crownTemplate(int, int) -> tuple<array<vector>,array<tuple<int,int,int>>>
+    Precondition: segments>2, rings>0
+    """
+    key = (segments, rings)
+    if key not in _crowns:
+        theta = pi*np.arange(1, rings+1)/(rings+1)
+        phi = 2*pi*np.arange(segments)/segments
+        ring = np.empty((rings, segments, 3))
+        ring[...,0] = np.sin(theta)[:,None]*np.cos(phi)[None,:]
+        ring[...,1] = np.cos(theta)[:,None]
+        ring[...,2] = np.sin(theta)[:,None]*np.sin(phi)[None,:]
+        points = np.vstack(([(0., 1., 0.)], ring.reshape(-1,3),
+                            [(0., -1., 0.)]))
+
+        j = np.arange(segments)
+        k = (j+1) % segments
+        bottom = len(points)-1
+        tris = [np.column_stack((np.zeros(segments, int), 1+j, 1+k))]
+        for r in range(rings-1):
+            a, b = 1+r*segments+j, 1+r*segments+k
+            tris.append(np.column_stack((a, b, b+segments)))
+            tris.append(np.column_stack((a, b+segments, a+segments)))
+        last = 1+(rings-1)*segments
+        tris.append(np.column_stack((np.full(segments, bottom), last+k,
+                                     last+j)))
+        tris = np.vstack(tris)
+
+        #wind every triangle outwards
+        corners = points[tris]
+        normal = np.cross(corners[:,1]-corners[:,0], corners[:,2]-corners[:,0])
+        inward = (normal*corners.sum(1)).sum(1) < 0
+        tris[inward] = tris[inward][:,[0,2,1]]
+        _crowns[key] = (points, tris.astype(np.uint32))
+    return _crowns[key]
+
+
+def crownClumps(sk, keepDepth):
+    """Group the branches deeper than keepDepth by the kept branch (at
+        keepDepth) they grow from; return the centre and half-size on each
+        axis of every group's bounding box, at least as large as its widest
+        twig.
+
+    crownClumps(skeleton, int) -> tuple<array<vector>,array<vector>>
+    """
+    depth = sk.depth.astype(int)
+    dropped = np.nonzero(depth > keepDepth)[0]
+    if len(dropped)==0:
+        return np.zeros((0,3)), np.zeros((0,3))
+
+    #walk each dropped branch up to its kept ancestor
+    ancestor = dropped.copy()
+    deep = depth[ancestor] > keepDepth
+    while deep.any():
+        ancestor[deep] = sk.parent[ancestor[deep]] - sk.first
+        deep = depth[ancestor] > keepDepth
+    group = np.unique(ancestor, return_inverse=True)[1].reshape(-1)
+    clumps = group.max()+1
+
+    start = sk.start[dropped].astype(float)
+    ends = start + sk.direction[dropped]*sk.length[dropped,None]
+    points = np.vstack((start, ends))
+    owner = np.concatenate((group, group))
+    lo = np.full((clumps,3), np.inf)
+    hi = np.full((clumps,3), -np.inf)
+    np.minimum.at(lo, owner, points)
+    np.maximum.at(hi, owner, points)
+    widest = np.zeros(clumps)
+    np.maximum.at(widest, group, sk.width[dropped].astype(float))
+    return 0.5*(lo+hi), np.maximum(0.5*(hi-lo), widest[:,None])
+
+
+class crownMesh(model):
+    """Specialisation of model: ellipsoid crown impostors, merged into one
+        mesh.
+
+    Constructor: crownMesh(display, color, int, int, renderer, dtype)
+    """
+
+    def __init__(self, window, color=(1,1,1), segments=6, rings=3,
+                 renderer=None, dtype='float64'):
+        """Create an empty crown model with the given sphere resolution."""
+
+        model.__init__(self, window, color, True, renderer, dtype)
+        self.segments = segments
+        self.rings = rings
+
+    def addCrowns(self, centers, radii):
+        """Add an axis-aligned ellipsoid for every centre and (x,y,z)
+            half-size, with one batched transform of the template.
+
+        addCrowns(array<vector>, array<vector>) -> void
+        """
+        centers = np.asarray(centers, float)
+        radii = np.asarray(radii, float)
+        n = len(centers)
+        if n==0:
+            return
+        unit, tris = crownTemplate(self.segments, self.rings)
+        points = centers[:,None,:] + unit[None,:,:]*radii[:,None,:]
+        #ellipsoid normals: the sphere's, scaled by the inverse radii
+        normals = unit[None,:,:]/radii[:,None,:]
+        normals /= np.sqrt((normals**2).sum(-1))[...,None]
+
+        verts = len(unit)
+        base = self._mesh.extend(points.reshape(-1,3), normals.reshape(-1,3),
+                                 self._col)
+        offsets = (np.arange(n, dtype=np.uint32)*verts)[:,None,None]
+        self._mesh.extendFaces((tris[None,:,:] + offsets).reshape(-1,3), base)
+
+
+class plantLOD:
+    """One plant, buildable at every detail level. Levels are built (headless)
+        when first asked for, and kept until released.
+
+    Constructor: plantLOD(seed, tuple<float,float,float>, int, int,
+                          list<tuple<int,int>>, dtype)
+    """
+
+    def __init__(self, s, origin=(0,0,0), master=None, plant=0,
+                 levels=detailLevels, dtype='float64'):
+        """Grow the plant at origin (as plant number plant of the master
+            seed), and work out what each detail level keeps.
+        """
+
+        self.seed = s
+        self.origin = np.asarray(origin, float)
+        self.levels = levels
+        self._dtype = dtype
+        self._builder = nullRenderer()
+        self._meshes = {}           #level -> list<model>
+
+        sk = growSkeleton(s, dtype, master, plant)
+        sk.start += self.origin.astype(sk.start.dtype)
+        self.skeleton = sk
+        deepest = int(sk.depth.max())
+        self._bands = colorBands(sk.depth, deepest+1, len(s.color))
+
+        self._keep = []             #per level: branch rows kept
+        self._clumps = []           #per level: crown centres and sizes
+        for segments, drop in levels:
+            keepDepth = max(deepest-drop, 0)
+            self._keep.append(sk.depth <= keepDepth)
+            self._clumps.append(crownClumps(sk, keepDepth))
+
+    def triangleCounts(self, crownSegments=6, crownRings=3):
+        """Return the number of triangles at each level, without building
+            them.
+
+        triangleCounts(int, int) -> array<int>
+        """
+        crown = len(crownTemplate(crownSegments, crownRings)[1])
+        return np.array([int(keep.sum())*2*segments + len(clumps[0])*crown
+                         for (segments, drop), keep, clumps
+                         in zip(self.levels, self._keep, self._clumps)])
+
+    def meshes(self, level):
+        """Return the models for the given level: one branch mesh per seed
+            colour with branches left, plus a crown mesh if any twigs were
+            dropped.
+
+        meshes(int) -> list<model>
+        """
+        if level not in self._meshes:
+            segments = self.levels[level][0]
+            built = []
+            for i in range(len(self.seed.color)):
+                m = branchMesh(None, self.seed.color[i], segments, True,
+                               self._builder, self._dtype)
+                rows = self._keep[level] & (self._bands==i)
+                if not rows.any():
+                    continue        #a band whose generations were dropped
+                m.addBranches(self.skeleton, rows)
+                built.append(m)
+            centers, radii = self._clumps[level]
+            if len(centers):
+                c = crownMesh(None, self.seed.color[-1],
+                              renderer=self._builder, dtype=self._dtype)
+                c.addCrowns(centers, radii)
+                built.append(c)
+            self._meshes[level] = built
+        return self._meshes[level]
+
+    def release(self, level):
+        """Free a built level's meshes.
+
+        release(int) -> void
+        """
+        self._meshes.pop(level, None)
+
+    def nbytes(self):
+        """Return the memory used by built meshes, in bytes.
+
+        nbytes() -> int
+        """
+        return sum(m.getMesh().nbytes() for built in self._meshes.values()
+                   for m in built)
+
+
+def chooseLevels(distances, counts, loddistance, budget=None):
+    """Return each plant's detail level from its distance to the camera. With
+        a triangle budget, the furthest plants are then coarsened, a cheaper
+        level at a time and as few as needed, until the total is within it
+        (or no plant has a cheaper level left).
+
+    chooseLevels(array<float>, array<array<int>>, float, int) -> array<int>
+    Precondition: counts[n][level] is plant n's triangle count at level
+    """
+    distances = np.asarray(distances, float)
+    counts = np.asarray(counts)
+    n, levels = counts.shape
+    ratio = np.maximum(distances/loddistance, 1.)
+    chosen = np.where(distances <= loddistance, 0,
+                      np.floor(np.log2(ratio)).astype(int)+1)
+    chosen = np.minimum(chosen, levels-1)
+    if budget is None:
+        return chosen
+
+    #a coarser level can cost more (its crowns outweighing the twigs they
+    #replace), so each level steps to the next one that is actually cheaper
+    #(levels if there is none)
+    cheaper = np.full((n, levels), levels)
+    for level in range(levels-1):
+        for j in range(levels-1, level, -1):
+            cheaper[:,level] = np.where(counts[:,j] < counts[:,level], j,
+                                        cheaper[:,level])
+
+    plants = np.arange(n)
+    furthest = np.argsort(-distances, kind='mergesort')
+    for step in range(levels-1):
+        excess = counts[plants, chosen].sum() - budget
+        if excess <= 0:
+            break
+        target = cheaper[plants, chosen]
+        coarser = furthest[target[furthest] < levels]
+        if len(coarser)==0:
+            break
+        saving = counts[coarser, chosen[coarser]] - counts[coarser,
+                                                           target[coarser]]
+        k = np.searchsorted(np.cumsum(saving), excess) + 1
+        chosen[coarser[:k]] = target[coarser[:k]]
+    return chosen
+
+
+class forest:
+    """Many plants, drawn at detail levels chosen from the camera position.
+
+    Constructor: forest(iterable<tuple<seed,tuple<float,float,float>>>, int,
+                        list<tuple<int,int>>, float, int, boolean, renderer,
+                        dtype)
+
+    Class invariant:
+        loddistance>0
+    """
+
+    def __init__(self, plants, master=None, levels=detailLevels,
+                 loddistance=8., budget=None, shading=False, renderer=None,
+                 dtype='float64'):
+        """Grow every (seed, origin) plant; plant n is grown as plant n of
+            the master seed. Plants are drawn with renderer (none if not
+            given), within budget triangles if a budget is given.
+        """
+
+        self.plants = [plantLOD(s, origin, master, n, levels, dtype)
+                       for n, (s, origin) in enumerate(plants)]
+        self.levels = levels
+        self.loddistance = float(loddistance)
+        self.budget = budget
+        self._shading = shading
+        self._renderer = renderer
+        self._origins = np.array([p.origin for p in self.plants]
+                                 ).reshape(-1,3)
+        self._counts = np.array([p.triangleCounts() for p in self.plants]
+                                ).reshape(-1,len(levels))
+        self._current = np.full(len(self.plants), -1)
+        self._drawn = {}            #plant -> renderer's drawn objects
+
+    def __len__(self):
+        """Return the number of plants."""
+
+        return len(self.plants)
+
+    def plantLevels(self, viewpoint):
+        """Return every plant's detail level seen from the viewpoint.
+
+        plantLevels(tuple<float,float,float>) -> array<int>
+        """
+        offset = self._origins - np.asarray(viewpoint, float)
+        distances = np.sqrt((offset**2).sum(1))
+        return chooseLevels(distances, self._counts, self.loddistance,
+                            self.budget)
+
+    def update(self, viewpoint):
+        """Bring every plant to its level for the viewpoint: build it if
+            needed and redraw plants that changed level, releasing their old
+            level. Return the total triangle count.
+
+        update(tuple<float,float,float>) -> int
+        """
+        chosen = self.plantLevels(viewpoint)
+        for n in np.nonzero(chosen != self._current)[0]:
+            plant, old = self.plants[n], self._current[n]
+            if old >= 0:
+                plant.release(old)
+            meshes = plant.meshes(chosen[n])
+            if self._renderer is not None:
+                for drawn in self._drawn.pop(n, []):
+                    self._renderer.erase(drawn)
+                if self._shading:
+                    for m in meshes:
+                        m.smoothNormals()
+                self._drawn[n] = [self._renderer.draw(m.getMesh(), False)
+                                  for m in meshes]
+        self._current = chosen
+        return int(self._counts[np.arange(len(chosen)), chosen].sum())
+
+    def nbytes(self):
+        """Return the memory used by built plant meshes, in bytes.
+
+        nbytes() -> int
+        """
+        return sum(p.nbytes() for p in self.plants)
+
+
+# ----------------------------------------------------------------------------
@@ -0,0 +1,418 @@
+"""
+PyPlant 1.0
+LIBRARY: Mesh Buffers
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Contiguous array storage for model geometry. Models build their vertices,
+normals and colours into a mesh buffer, together with an index buffer of
+triangles, which is handed to a renderer only once the model is complete.
+Also provides whole-grid triangulation helpers for height-field meshes.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import numpy as np
+from instrument import probe
+
+# ------------------------------------------------------------------------------
+
+
+class meshBuffer:
+    """A growable set of per-vertex position, normal and colour arrays, and
+        an index buffer of triangles referring to them.
+
+    Two flags say how the stored triangles are drawn, so neither needs extra
+    vertices: with flat, every triangle is lit by its own face normal rather
+    than its vertex normals; with twoSided, every triangle is also drawn
+    reversed, with its normals negated. Both are applied when the triangles
+    are expanded for drawing (expanded()) or exporting (resolved()).
+
+    Constructor: meshBuffer(dtype, int)
+    Class invariant: positions, normals and colors all have len(self) rows
+                     and
+                     0<=triangles()[n][k]<len(self), for all n, k
+    """
+
+    def __init__(self, dtype='float64', capacity=64):
+        """Allocate empty (capacity,3) arrays of the given float type."""
+
+        self.dtype = np.dtype(dtype)
+        self._count = 0
+        self._pos = np.empty((capacity,3), self.dtype)
+        self._norm = np.empty((capacity,3), self.dtype)
+        self._col = np.empty((capacity,3), self.dtype)
+        self._triCount = 0
+        self._tri = np.empty((capacity,3), np.uint32)
+        self.flat = False
+        self.twoSided = False
+
+    @staticmethod
+    def fromArrays(positions, normals, colors, triangles):
+        """Return a mesh buffer using the given arrays as its storage, without
+            copying them (they are copied if the buffer later grows).
+
+        fromArrays(array<vector>, array<vector>, array<color>,
+                   array<tuple<int,int,int>>) -> meshBuffer
+        """
+        mesh = meshBuffer(positions.dtype, 0)
+        mesh._pos, mesh._norm, mesh._col = positions, normals, colors
+        mesh._count = len(positions)
+        mesh._tri = triangles
+        mesh._triCount = len(triangles)
+        return mesh
+
+    def __len__(self):
+        """Return the number of stored vertices."""
+
+        return self._count
+
+    def _reserve(self, extra):
+        """Grow the arrays (doubling) so extra more vertices will fit."""
+
+        needed = self._count + extra
+        capacity = len(self._pos)
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_pos', '_norm', '_col'):
+            old = getattr(self, name)
+            new = np.empty((capacity,3), self.dtype)
+            new[:self._count] = old[:self._count]
+            setattr(self, name, new)
+
+    def _reserveFaces(self, extra):
+        """Grow the index buffer (doubling) so extra more triangles will fit."""
+
+        needed = self._triCount + extra
+        capacity = len(self._tri)
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        new = np.empty((capacity,3), np.uint32)
+        new[:self._triCount] = self._tri[:self._triCount]
+        self._tri = new
+
+    def append(self, pos, normal, color):
+        """Add a single vertex; return its index.
+
+        append(tuple<float,float,float>, tuple<float,float,float>, color)
+            -> int
+        """
+        self._reserve(1)
+        n = self._count
+        self._pos[n] = pos
+        self._norm[n] = normal
+        self._col[n] = color
+        self._count = n+1
+        return n
+
+    def extend(self, positions, normals, colors):
+        """Add a block of vertices; return the index of the first one.
+            Normals/colors may be a single row, which is repeated for every
+            vertex.
+
+        extend(array<vector>, array<vector>, array<color>) -> int
+        """
+        positions = np.asarray(positions).reshape(-1,3)
+        k = len(positions)
+        self._reserve(k)
+        n = self._count
+        self._pos[n:n+k] = positions
+        self._norm[n:n+k] = normals
+        self._col[n:n+k] = colors
+        self._count = n+k
+        return n
+
+    def addFace(self, a, b, c):
+        """Add a triangle made of three stored vertices.
+
+        addFace(int, int, int) -> void
+        """
+        self._reserveFaces(1)
+        self._tri[self._triCount] = (a, b, c)
+        self._triCount += 1
+
+    def extendFaces(self, triangles, offset=0):
+        """Add a block of triangles; offset is added to every index.
+
+        extendFaces(array<tuple<int,int,int>>, int) -> void
+        """
+        triangles = np.asarray(triangles).reshape(-1,3)
+        k = len(triangles)
+        self._reserveFaces(k)
+        n = self._triCount
+        self._tri[n:n+k] = triangles
+        if offset:
+            self._tri[n:n+k] += offset
+        self._triCount = n+k
+
+    def positions(self):
+        """Return a view of the stored vertex positions.
+
+        positions() -> array<vector>
+        """
+        return self._pos[:self._count]
+
+    def normals(self):
+        """Return a view of the stored vertex normals.
+
+        normals() -> array<vector>
+        """
+        return self._norm[:self._count]
+
+    def colors(self):
+        """Return a view of the stored vertex colours.
+
+        colors() -> array<color>
+        """
+        return self._col[:self._count]
+
+    def triangles(self):
+        """Return a view of the stored (M,3) triangle index buffer.
+
+        triangles() -> array<tuple<int,int,int>>
+        """
+        return self._tri[:self._triCount]
+
+    def faceCount(self):
+        """Return the number of stored triangles.
+
+        faceCount() -> int
+        """
+        return self._triCount
+
+    def drawnFaceCount(self):
+        """Return the number of triangles drawn: those stored, twice over if
+            two-sided.
+
+        drawnFaceCount() -> int
+        """
+        return self._triCount*(2 if self.twoSided else 1)
+
+    def _cornerNormals(self):
+        """Return the normal of every triangle corner, (M,3,3): the vertex
+            normals, or if flat, each triangle's face normal.
+        """
+        tris = self.triangles()
+        if self.flat:
+            faces = faceNormals(self.positions(), tris).astype(self.dtype)
+            return np.repeat(faces[:,None,:], 3, axis=1)
+        return self.normals()[tris]
+
+    def expanded(self):
+        """Return positions, normals and colours with three rows per
+            triangle, in triangle order (a flat, unindexed triangle list),
+            followed by the reversed back faces if two-sided.
+
+        expanded() -> tuple<array<vector>,array<vector>,array<color>>
+        """
+        tris = self.triangles()
+        pos = self.positions()[tris]
+        normal = self._cornerNormals()
+        color = self.colors()[tris]
+        if self.twoSided:
+            pos = np.concatenate((pos, pos[:,::-1]))
+            normal = np.concatenate((normal, -normal[:,::-1]))
+            color = np.concatenate((color, color[:,::-1]))
+        return (pos.reshape(-1,3), normal.reshape(-1,3),
+                color.reshape(-1,3))
+
+    def resolved(self):
+        """Return an indexed mesh drawn the same way without the flat and
+            two-sided flags, for writing out: flat triangles get their own
+            corners, and back faces their own vertices with negated normals.
+            A mesh with neither flag is returned as it is.
+
+        resolved() -> meshBuffer
+        """
+        if not (self.flat or self.twoSided):
+            return self
+        pos, normal = self.positions(), self.normals()
+        color, tris = self.colors(), self.triangles()
+        if self.flat:
+            corners = tris.reshape(-1)
+            normal = self._cornerNormals().reshape(-1,3)
+            pos, color = pos[corners], color[corners]
+            tris = np.arange(len(pos), dtype=np.uint32).reshape(-1,3)
+        if self.twoSided:
+            n = len(pos)
+            pos = np.concatenate((pos, pos))
+            normal = np.concatenate((normal, -normal))
+            color = np.concatenate((color, color))
+            tris = np.vstack((tris, tris[:,::-1] + np.uint32(n)))
+        return meshBuffer.fromArrays(pos, normal, color, tris)
+
+    def nbytes(self):
+        """Return the memory used by the stored vertices and indices, in
+            bytes.
+
+        nbytes() -> int
+        """
+        return (3 * self._count * 3 * self.dtype.itemsize
+                + self._triCount * 3 * self._tri.itemsize)
+
+    def computeNormals(self, smooth=True, weld=False, angle=None):
+        """Replace the vertex normals with area-weighted smooth normals
+            computed from the triangles (see vertexNormals); or if not
+            smooth, draw flat, with each triangle's face normal.
+
+        computeNormals(boolean, boolean, float) -> void
+        """
+        self.flat = not smooth
+        if smooth:
+            self._norm[:self._count] = vertexNormals(self.positions(),
+                                                     self.triangles(), weld,
+                                                     angle)
+
+
+def gridTriangles(nx, nz):
+    """Return the index buffer for an nx by nz grid of shared vertices, where
+        vertex (i,j) is stored at row i*nz+j. Each grid square is split into
+        two triangles, wound in the same order as model.addPolygon's fan.
+
+    gridTriangles(int, int) -> array<tuple<int,int,int>>
+    Precondition: nx>1, nz>1
+    """
+    corner = np.arange(nx*nz, dtype=np.uint32).reshape(nx,nz)[:-1,:-1].ravel()
+    p00 = corner
+    p01 = corner + 1
+    p11 = corner + nz + 1
+    p10 = corner + nz
+    tris = np.empty((len(corner),2,3), np.uint32)
+    tris[:,0,0] = p00
+    tris[:,0,1] = p01
+    tris[:,0,2] = p11
+    tris[:,1,0] = p00
+    tris[:,1,1] = p11
+    tris[:,1,2] = p10
+    return tris.reshape(-1,3)
+
+
+def gridNormals(xlist, zlist, ygrid):
+    """Return unit vertex normals for a height field, from its gradient.
+
+    gridNormals(array<float>, array<float>, array<array<float>>)
+        -> array<array<vector>>
+    Precondition: len(xlist)>1, len(zlist)>1
+    """
+    dydx, dydz = np.gradient(np.asarray(ygrid, float), xlist, zlist)
+    normals = np.empty(dydx.shape + (3,))
+    normals[...,0] = -dydx
+    normals[...,1] = 1.
+    normals[...,2] = -dydz
+    normals /= np.sqrt((normals**2).sum(-1))[...,None]
+    return normals
+
+
+
+def _unitRows(vectors):
+    """Scale each row to unit length, leaving zero rows as zero."""
+
+    length = np.sqrt((vectors**2).sum(-1))
+    return vectors/np.where(length>0, length, 1.)[...,None]
+
+
+def faceNormals(positions, triangles, unit=True):
+    """Return the normal of every triangle, from one batched cross product:
+        unit length, or if not unit, twice the triangle's area (zero for
+        degenerate triangles).
+
+    faceNormals(array<vector>, array<tuple<int,int,int>>, boolean)
+        -> array<vector>
+    """
+    positions = np.asarray(positions, float)
+    tris = np.asarray(triangles, np.int64)
+    a = positions[tris[:,0]]
+    normals = np.cross(positions[tris[:,1]]-a, positions[tris[:,2]]-a)
+    if unit:
+        return _unitRows(normals)
+    return normals
+
+
+def vertexNormals(positions, triangles, weld=False, angle=None):
+    """Return smooth unit vertex normals: the area-weighted sum of the face
+        normals around each vertex, accumulated by scatter-adding over the
+        index buffer.
+        With weld, vertices at the same position count as one, for meshes
+        built from separate triangles (e.g. by model.addTriangle). With an
+        angle (radians), only faces within that angle of each other are
+        averaged, as in Vpython's faces.smooth(), so creases stay apart:
+        the faces around each vertex (or position) are clustered, each
+        cluster taking the faces within angle of its first, and a vertex
+        takes the normal of its first face's cluster. The work is linear
+        in the corners times the clusters around a vertex.
+
+    vertexNormals(array<vector>, array<tuple<int,int,int>>, boolean, float)
+        -> array<vector>
+    """
+    positions = np.asarray(positions, float)
+    tris = np.asarray(triangles, np.int64)
+    weighted = faceNormals(positions, tris, False)
+    if not weld and angle is None:
+        normals = np.zeros(positions.shape)
+        for k in range(3):
+            np.add.at(normals, tris[:,k], weighted)
+        return _unitRows(normals)
+
+    if len(tris)==0:
+        return np.zeros(positions.shape)
+
+    #triangle corners, grouped by vertex (or by position when welding)
+    corners = tris.ravel()
+    cornerFace = np.repeat(np.arange(len(tris)), 3)
+    if weld:
+        group = np.unique(positions, axis=0,
+                          return_inverse=True)[1].reshape(-1)[corners]
+    else:
+        group = corners
+
+    #split each group into clusters of faces within angle of each other:
+    #each round, the first corner left in every group seeds a cluster and
+    #takes the corners left within angle of it (cluster = seed corner)
+    if angle is None:
+        cluster = group
+    else:
+        unit = _unitRows(weighted)[cornerFace]
+        cosine = np.cos(angle)
+        cluster = np.empty(len(corners), np.int64)
+        left = np.argsort(group, kind='mergesort')
+        while len(left):
+            g = group[left]
+            start = np.ones(len(left), bool)
+            start[1:] = g[1:] != g[:-1]
+            seed = left[start][np.cumsum(start)-1]
+            near = start | ((unit[left]*unit[seed]).sum(1) >= cosine)
+            cluster[left[near]] = seed[near]
+            left = left[~near]
+    sums = np.zeros((int(cluster.max())+1, 3))
+    np.add.at(sums, cluster, weighted[cornerFace])
+
+    #each vertex takes the normal of its first corner's cluster
+    normals = np.zeros(positions.shape)
+    used, first = np.unique(corners, return_index=True)
+    normals[used] = sums[cluster[first]]
+    return _unitRows(normals)
+
+
+#instrumentation probes (see instrument.py)
+probe(globals(), 'faceNormals',
+      counts=lambda normals, *args, **kwargs: {'face normals': len(normals)})
+probe(globals(), 'vertexNormals',
+      counts=lambda normals, *args, **kwargs: {'vertex normals': len(normals)})
+
+
+# ----------------------------------------------------------------------------
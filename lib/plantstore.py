@@ -0,0 +1,278 @@
+"""
+PyPlant 1.0
+LIBRARY: Plant Stores
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+An on-disk store for generated plants and forests. The skeletons (and
+optionally meshes) of many plants are kept as flat typed arrays in .npy
+files, which are reopened memory-mapped: opening a store copies nothing, and
+only the plants actually used are paged in. Plants are keyed by their seed's
+content and the random seed they were grown with.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import os
+import struct
+import hashlib
+import numpy as np
+
+from growth import skeleton, growSkeleton
+from meshes import meshBuffer
+from branches import plantMeshes
+from renderers import nullRenderer
+
+# ------------------------------------------------------------------------------
+"""
+Store Structure (a folder of .npy files):
+/
+index.npy       one indexType row per plant, in the order plants were added
+sorted.npy      int64 plant numbers, sorted by key
+parent.npy, depth.npy, start.npy, direction.npy, length.npy, width.npy
+                every plant's skeleton arrays, one after another; parent rows
+                are numbered within each plant
+positions.npy, normals.npy, colors.npy, triangles.npy
+                every plant's merged mesh, one after another; triangle
+                indices are numbered within each plant
+/
+While a store is being written, each array file has a fixed-size header
+which is rewritten with the final shape when the store is closed.
+"""
+# ------------------------------------------------------------------------------
+
+indexType = np.dtype([('key', 'S40'), ('origin', '<f8', (3,)),
+                      ('first', '<i8'), ('count', '<i8'),
+                      ('vfirst', '<i8'), ('vcount', '<i8'),
+                      ('tfirst', '<i8'), ('tcount', '<i8')])
+
+skeletonArrays = ['parent', 'depth', 'start', 'direction', 'length', 'width']
+meshArrays = ['positions', 'normals', 'colors', 'triangles']
+
+HEADERSIZE = 128
+
+
+def plantKey(s, master=None, plant=0):
+    """Return the store key for a plant grown from the seed's numeric fields
+        (its name does not affect the plant) with the given random seed and
+        plant number.
+
+    plantKey(seed, int, int) -> string
+    """
+    content = repr((s.values(), master, plant))
+    return hashlib.sha1(content.encode('ascii')).hexdigest()
+
+
+def _npyHeader(dtype, shape):
+    """Return a version 1.0 .npy header of exactly HEADERSIZE bytes."""
+
+    info = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape))
+    info = info.ljust(HEADERSIZE-10-1) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(info)) + \
+        info.encode('latin1')
+
+
+class _arrayFile:
+    """An .npy file being appended to, row block by row block."""
+
+    def __init__(self, filename, dtype, rowShape=()):
+        """Create the file with an empty shape in its header."""
+
+        self._f = open(filename, 'wb')
+        self._dtype = np.dtype(dtype)
+        self._rowShape = tuple(rowShape)
+        self.rows = 0
+        self._f.write(_npyHeader(self._dtype, (0,)+self._rowShape))
+
+    def append(self, data):
+        """Write rows to the end of the file."""
+
+        data = np.ascontiguousarray(data, self._dtype)
+        self._f.write(data.tobytes())
+        self.rows += len(data)
+
+    def close(self):
+        """Rewrite the header with the final shape; close the file."""
+
+        self._f.seek(0)
+        self._f.write(_npyHeader(self._dtype, (self.rows,)+self._rowShape))
+        self._f.close()
+
+
+class plantStoreWriter:
+    """Builds a plant store folder, one plant at a time.
+
+    Constructor: plantStoreWriter(string, dtype)
+    """
+
+    def __init__(self, folder, dtype='float32'):
+        """Create the folder (if needed) and its empty array files."""
+
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        path = lambda name: os.path.join(folder, name+'.npy')
+        self._folder = folder
+        self._index = []
+        self._files = {
+            'parent': _arrayFile(path('parent'), '<i8'),
+            'depth': _arrayFile(path('depth'), 'u1'),
+            'start': _arrayFile(path('start'), dtype, (3,)),
+            'direction': _arrayFile(path('direction'), dtype, (3,)),
+            'length': _arrayFile(path('length'), dtype),
+            'width': _arrayFile(path('width'), dtype),
+            'positions': _arrayFile(path('positions'), dtype, (3,)),
+            'normals': _arrayFile(path('normals'), dtype, (3,)),
+            'colors': _arrayFile(path('colors'), dtype, (3,)),
+            'triangles': _arrayFile(path('triangles'), '<u4', (3,))}
+
+    def add(self, key, sk, meshes=(), origin=(0, 0, 0)):
+        """Append a plant: its skeleton, and any meshes (models or mesh
+            buffers), merged into one, at the given position. Return the plant
+            number.
+
+        add(string, skeleton, list<model or meshBuffer>,
+            tuple<float,float,float>) -> int
+        """
+        files = self._files
+        first = files['parent'].rows
+        for name in skeletonArrays:
+            files[name].append(getattr(sk, name))
+
+        vfirst = files['positions'].rows
+        tfirst = files['triangles'].rows
+        for mesh in meshes:
+            if hasattr(mesh, 'getMesh'):
+                mesh = mesh.getMesh()
+            mesh = mesh.resolved()      #stored meshes carry no draw flags
+            base = files['positions'].rows - vfirst
+            files['positions'].append(mesh.positions())
+            files['normals'].append(mesh.normals())
+            files['colors'].append(mesh.colors())
+            files['triangles'].append(mesh.triangles().astype(np.int64)
+                                      + base)
+
+        self._index.append((key, origin, first, len(sk),
+                            vfirst, files['positions'].rows - vfirst,
+                            tfirst, files['triangles'].rows - tfirst))
+        return len(self._index)-1
+
+    def close(self):
+        """Finish every array file and write the index.
+
+        close() -> void
+        """
+        for f in self._files.values():
+            f.close()
+        index = np.array(self._index, indexType)
+        np.save(os.path.join(self._folder, 'index.npy'), index)
+        np.save(os.path.join(self._folder, 'sorted.npy'),
+                np.argsort(index['key'], kind='mergesort').astype('<i8'))
+
+
+class plantStore:
+    """A memory-mapped, read-only plant store.
+
+    Constructor: plantStore(string)
+    """
+
+    def __init__(self, folder):
+        """Map every array file of the store."""
+
+        load = lambda name: np.load(os.path.join(folder, name+'.npy'),
+                                    mmap_mode='r')
+        self.index = load('index')
+        self._sorted = load('sorted')
+        self._arrays = {}
+        for name in skeletonArrays + meshArrays:
+            self._arrays[name] = load(name)
+
+    def __len__(self):
+        """Return the number of stored plants."""
+
+        return len(self.index)
+
+    def find(self, key):
+        """Return the plant number stored under key, or None.
+
+        find(string) -> int or None
+        """
+        key = key.encode('ascii') if not isinstance(key, bytes) else key
+        keys = self.index['key']
+        lo, hi = 0, len(self._sorted)
+        #binary search through the sorted order, touching only log(n) keys
+        while lo < hi:
+            mid = (lo+hi)//2
+            if keys[self._sorted[mid]] < key:
+                lo = mid+1
+            else:
+                hi = mid
+        if lo < len(self._sorted) and keys[self._sorted[lo]] == key:
+            return int(self._sorted[lo])
+        return None
+
+    def origin(self, n):
+        """Return the position of plant n.
+
+        origin(int) -> tuple<float,float,float>
+        """
+        return tuple(self.index[n]['origin'])
+
+    def skeletonAt(self, n):
+        """Return plant n's skeleton, as views of the mapped arrays.
+
+        skeletonAt(int) -> skeleton
+        """
+        entry = self.index[n]
+        rows = slice(entry['first'], entry['first']+entry['count'])
+        sk = skeleton(0)
+        for name in skeletonArrays:
+            setattr(sk, name, self._arrays[name][rows])
+        return sk
+
+    def meshAt(self, n):
+        """Return plant n's merged mesh, as views of the mapped arrays.
+
+        meshAt(int) -> meshBuffer
+        """
+        entry = self.index[n]
+        verts = slice(entry['vfirst'], entry['vfirst']+entry['vcount'])
+        tris = slice(entry['tfirst'], entry['tfirst']+entry['tcount'])
+        return meshBuffer.fromArrays(self._arrays['positions'][verts],
+                                     self._arrays['normals'][verts],
+                                     self._arrays['colors'][verts],
+                                     self._arrays['triangles'][tris])
+
+
+def writeForest(folder, plants, master=None, segments=6, dtype='float32'):
+    """Grow and store a forest. plants is an iterable of (seed, origin)
+        pairs; the nth is grown as plant n of the master seed, with branch
+        meshes if segments is not None. Return the number of plants stored.
+
+    writeForest(string, iterable<tuple<seed,tuple<float,float,float>>>, int,
+                int, dtype) -> int
+    """
+    writer = plantStoreWriter(folder, dtype)
+    n = 0
+    for s, origin in plants:
+        sk = growSkeleton(s, dtype, master, n)
+        meshes = ()
+        if segments is not None:
+            meshes = plantMeshes(None, s, sk, segments,
+                                 renderer=nullRenderer(), dtype=dtype)
+        writer.add(plantKey(s, master, n), sk, meshes, origin)
+        n += 1
+    writer.close()
+    return n
+
+
+# ----------------------------------------------------------------------------
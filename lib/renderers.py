@@ -0,0 +1,105 @@
+"""
+PyPlant 1.0
+LIBRARY: Model Renderers
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Back ends that take a finished mesh buffer and draw it. The Visual renderer
+creates a faces object in a display; the null renderer draws nothing, so that
+models can be built and measured without a display.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+# ------------------------------------------------------------------------------
+"""
+Renderer interface:
+    draw(meshBuffer, boolean) -> object
+Called once per model, after the model's geometry is complete. The boolean
+requests smooth shading. The return value is kept by the model as its drawn
+object (e.g. the Visual faces object), or None.
+    erase(object) -> void
+Removes something previously returned by draw() from the scene.
+"""
+# ------------------------------------------------------------------------------
+
+
+class nullRenderer:
+    """A headless renderer: counts what it is given and draws nothing.
+
+    Constructor: nullRenderer()
+    """
+
+    def __init__(self):
+        """Start with nothing drawn."""
+
+        self.models = 0
+        self.vertices = 0
+        self.triangles = 0
+        self.erased = 0
+
+    def draw(self, mesh, smooth=False):
+        """Record the mesh size.
+
+        draw(meshBuffer, boolean) -> None
+        """
+        self.models += 1
+        self.vertices += len(mesh)
+        self.triangles += mesh.drawnFaceCount()
+        return None
+
+    def erase(self, drawn):
+        """Nothing was drawn, so there is nothing to remove.
+
+        erase(None) -> void
+        """
+        self.erased += 1
+
+
+class visualRenderer:
+    """Draws meshes as Vpython faces objects in the given display.
+
+    Constructor: visualRenderer(display)
+    """
+
+    def __init__(self, window):
+        """Store the target display."""
+
+        self._window = window
+
+    def draw(self, mesh, smooth=False):
+        """Pass the whole mesh to a new faces object in one call. Faces
+            objects are unindexed, so the triangles are expanded here (with
+            their flat normals and back faces, if the mesh has them).
+
+        draw(meshBuffer, boolean) -> faces
+        """
+        from visual import frame, faces
+
+        pos, normal, color = mesh.expanded()
+        f = frame(display=self._window)
+        poly = faces(frame=f, display=self._window, pos=pos, normal=normal,
+                     color=color)
+        if smooth:
+            poly.smooth()
+        return poly
+
+    def erase(self, drawn):
+        """Hide a faces object (and its frame) drawn by this renderer.
+
+        erase(faces) -> void
+        """
+        drawn.visible = False
+        drawn.frame.visible = False
+
+
+# ----------------------------------------------------------------------------
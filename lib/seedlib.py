@@ -0,0 +1,248 @@
+"""
+PyPlant 1.0
+LIBRARY: Packed Seed Libraries
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Reading and writing of seed library files (.sdl): many seeds packed into one
+binary file of fixed-width records with a sorted name index. Libraries are
+opened memory-mapped, so loading one seed or all of them reads a single file.
+Includes import/export to and from folders of seed data files (.sdf).
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import os
+import struct
+import numpy as np
+
+from seeds import dataTypes, fieldNames, seed, seedFile_check, seedFile_read
+from common import filterFileChars
+
+# ------------------------------------------------------------------------------
+"""
+File Structure for seed library files (little-endian):
+/
+header      32 bytes:   'PYPLSLIB', uint32 version, uint32 count,
+                        uint32 record size, uint64 index offset, padding
+records     count * recordType: the 21 seed file lines in order; the name
+                        as 64 bytes of UTF-8 (null padded, truncated), then
+                        each numeric line as float64, or int32 where
+                        dataTypes marks it as an integer
+index       count * int32: record numbers, sorted by name
+/
+"""
+
+MAGIC = b'PYPLSLIB'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIQ4x')
+NAMESIZE = 64
+
+recordType = np.dtype([('name', 'S%d' % NAMESIZE)]
+                      + [(fieldNames[i], '<i4' if dataTypes[i][0] else '<f8')
+                         for i in range(1, len(dataTypes))])
+
+# ------------------------------------------------------------------------------
+
+
+def _encodeName(name):
+    """Return a seed name as UTF-8 bytes, at most NAMESIZE long."""
+
+    if not isinstance(name, bytes):
+        name = name.encode('utf-8')
+    return name[:NAMESIZE]
+
+
+def _decodeName(name):
+    """Return a stored name as a native string."""
+
+    if str is bytes:
+        return name
+    return name.decode('utf-8', 'replace')
+
+
+def seedRecords(seeds):
+    """Pack a list of seeds into a record array.
+
+    seedRecords(list<seed>) -> array<recordType>
+    """
+    records = np.zeros(len(seeds), recordType)
+    records['name'] = [_encodeName(s.name) for s in seeds]
+    values = np.array([s.values() for s in seeds],
+                      float).reshape(len(seeds), len(fieldNames)-1)
+    for i in range(1, len(fieldNames)):
+        records[fieldNames[i]] = values[:, i-1]
+    return records
+
+
+def writeLibrary(filename, seeds):
+    """Write a list of seeds (or a record array) to a seed library file.
+
+    writeLibrary(string, list<seed> or array<recordType>) -> void
+    """
+    if not isinstance(seeds, np.ndarray):
+        seeds = seedRecords(seeds)
+    records = seeds.astype(recordType)
+    index = np.argsort(records['name'], kind='mergesort').astype('<i4')
+
+    f = open(filename, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, len(records), recordType.itemsize,
+                        HEADER.size + records.nbytes))
+    f.write(records.tobytes())
+    f.write(index.tobytes())
+    f.close()
+
+
+def recordData(record):
+    """Return a record as the 21 lines of a seed data file.
+
+    recordData(recordType) -> list<string>
+    """
+    data = [_decodeName(record['name'])]
+    for i in range(1, len(fieldNames)):
+        if dataTypes[i][0]:
+            data.append(str(int(record[fieldNames[i]])))
+        else:
+            data.append(repr(float(record[fieldNames[i]])))
+    return data
+
+
+class seedLibrary:
+    """A memory-mapped, read-only seed library file.
+
+    Constructor: seedLibrary(string)
+    Class invariant: the file was written by writeLibrary
+    """
+
+    def __init__(self, filename):
+        """Read the header and map the records and index."""
+
+        self.filename = filename
+        f = open(filename, 'rb')
+        magic, version, count, size, indexOffset = HEADER.unpack(
+            f.read(HEADER.size))
+        f.close()
+        if magic != MAGIC or version != VERSION or size != recordType.itemsize:
+            raise ValueError('not a version %d seed library: %s'
+                             % (VERSION, filename))
+
+        if count:
+            self.records = np.memmap(filename, recordType, 'r', HEADER.size,
+                                     (count,))
+            self._index = np.memmap(filename, '<i4', 'r', indexOffset,
+                                    (count,))
+        else:
+            self.records = np.zeros(0, recordType)
+            self._index = np.zeros(0, '<i4')
+        self._sortedNames = None
+
+    def __len__(self):
+        """Return the number of seeds in the library."""
+
+        return len(self.records)
+
+    def names(self):
+        """Return every seed name, in record order.
+
+        names() -> list<string>
+        """
+        return [_decodeName(n) for n in self.records['name']]
+
+    def find(self, name):
+        """Return the record number of the named seed, or None.
+
+        find(string) -> int or None
+        """
+        if self._sortedNames is None:
+            self._sortedNames = self.records['name'][self._index]
+        key = _encodeName(name)
+        pos = np.searchsorted(self._sortedNames, key)
+        if pos < len(self) and self._sortedNames[pos] == key:
+            return int(self._index[pos])
+        return None
+
+    def seedAt(self, n):
+        """Return a seed data structure for record number n.
+
+        seedAt(int) -> seed
+        """
+        record = self.records[n]
+        name = _decodeName(record['name'])
+        return seed([name] + [record[f] for f in fieldNames[1:]],
+                    os.path.join('dat', filterFileChars(name)+'.sdf'))
+
+    def load(self, name):
+        """Return the named seed, or None if the library does not hold it.
+
+        load(string) -> seed or None
+        """
+        n = self.find(name)
+        if n is None:
+            return None
+        return self.seedAt(n)
+
+    def loadAll(self):
+        """Return every seed in the library.
+
+        loadAll() -> list<seed>
+        """
+        return [self.seedAt(n) for n in range(len(self))]
+
+    def matrix(self):
+        """Return the numeric fields of every seed as an (N,20) float array,
+            in seed file order (see evolution.py).
+
+        matrix() -> array<array<float>>
+        """
+        out = np.empty((len(self), len(fieldNames)-1))
+        for i in range(1, len(fieldNames)):
+            out[:, i-1] = self.records[fieldNames[i]]
+        return out
+
+
+def importSdf(folder, filename):
+    """Pack every valid .sdf file in the folder into a seed library file;
+        return the names of the files that were skipped as invalid.
+
+    importSdf(string, string) -> list<string>
+    """
+    seeds = []
+    skipped = []
+    for entry in sorted(os.listdir(folder)):
+        if not entry.endswith('.sdf'):
+            continue
+        path = os.path.join(folder, entry)
+        data = seedFile_read(path)
+        if seedFile_check(data):
+            seeds.append(seed(data, path))
+        else:
+            skipped.append(entry)
+    writeLibrary(filename, seeds)
+    return skipped
+
+
+def exportSdf(filename, folder):
+    """Write every seed in the library to a .sdf file in the folder; return
+        the number of files written.
+
+    exportSdf(string, string) -> int
+    """
+    lib = seedLibrary(filename)
+    for n in range(len(lib)):
+        data = recordData(lib.records[n])
+        f = open(os.path.join(folder, filterFileChars(data[0])+'.sdf'), 'w')
+        f.write('\n'.join(data))
+        f.close()
+    return len(lib)
+
+
+# ----------------------------------------------------------------------------
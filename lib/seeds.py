@@ -18,7 +18,13 @@ I also grant the right to non-commercial use of the source code without my
 express permission. Commercial users must seek the permission of the author.
 """
 
+import os
 import os.path
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+import numpy as np
+
+from instrument import probe
 
 # -------------------------------------------------------------------------------------
 """
@@ -55,62 +61,186 @@ dataTypes=[None,(False,0,1),(False,0,1),(False,0,1),(False,0,1),(False,0,1),
            (False,0,60*60*24*365*300),(False,0,0.75),(False,0.5,50),
            (False,0.01,5),(False,5,75),(False,-0.75,0),(False,-0.75,0),
            (False,-0.5,0),(True,2,15),(True,1,30),(True,0,15)]
+
+#short names for each line of the file
+fieldNames=['name',
+            'color1R','color1G','color1B',
+            'color2R','color2G','color2B',
+            'color3R','color3G','color3B',
+            'cycleT','mutator','iniLen','iniWidth','iniAngle',
+            'rocLen','rocWidth','rocAngle','steps','divs','divInc']
     
 # -------------------------------------------------------------------------------------
 
 
-class seed:
+class seed(object):
     """A container class to hold seed data in a meaningful format.
+    Every field is converted to its int or float type once, on construction,
+    and the class uses __slots__ so that large numbers of seeds stay small.
 
     Constructor: seed(list<string>,string)
     Class invariant: filedata has been validated by seedFile_check(filedata)
     """
+    __slots__=('name','color','cycleT','mutator','iniLen','iniWidth',
+               'iniAngle','rocLen','rocWidth','rocAngle','steps','divs',
+               'divInc','filename')
+
     def __init__(self,filedata,filename):
-        """Fill the data structure with values from the file contents."""
-        self._data = filedata
+        """Fill the data structure with values from the file contents.
+        Numeric lines may be strings or numbers."""
+        values=[]
+        for i in range(1,21):
+            if dataTypes[i][0]:
+                values.append(int(float(filedata[i])))
+            else:
+                values.append(float(filedata[i]))
         self.name = filedata[0]
-        self.color=[]
-        for x in range(3):
-            self.color.append((filedata[x+1],filedata[x+2],filedata[x+3]))
+        self.color = (tuple(values[0:3]),tuple(values[3:6]),
+                      tuple(values[6:9]))
         #Growth Cycle Period
-        self.cycleT = filedata[10]
+        self.cycleT = values[9]
         #Growth Mutation Factor
-        self.mutator = filedata[11]
+        self.mutator = values[10]
         #First stem - Length      
-        self.iniLen = filedata[12]
+        self.iniLen = values[11]
         #First stem - Diameter 
-        self.iniWidth = filedata[13]
+        self.iniWidth = values[12]
         #First stem - branch's Splitting Angle 
-        self.iniAngle = filedata[14]
+        self.iniAngle = values[13]
         #% Decrease in Branch Length/iteration      
-        self.rocLen = filedata[15]
+        self.rocLen = values[14]
         #% Decrease in Branch Diameter/iteration 
-        self.rocWidth = filedata[16]
+        self.rocWidth = values[15]
         #% Decrease in Branch Splitting Angle/iteration
-        self.rocAngle = filedata[17]
+        self.rocAngle = values[16]
         #Number of iterations (branch divisions)
-        self.steps = filedata[18]
+        self.steps = values[17]
         #Number of Splits (new branches)/iteration        
-        self.divs = filedata[19]
+        self.divs = values[18]
         #Number of Extra Splits (new branches)/iteration
-        self.divInc = filedata[20]
+        self.divInc = values[19]
         self.filename = filename
 
+    def values(self):
+        """Return the 20 numeric fields, in file order.
+
+        values() -> list<float or int>
+        """
+        return (list(self.color[0])+list(self.color[1])+list(self.color[2])
+                +[self.cycleT,self.mutator,self.iniLen,self.iniWidth,
+                  self.iniAngle,self.rocLen,self.rocWidth,self.rocAngle,
+                  self.steps,self.divs,self.divInc])
+
+    def fileData(self):
+        """Return the seed as the 21 lines of a seed file.
+
+        fileData() -> list<string>
+        """
+        data=[self.name]
+        for val in self.values():
+            data.append(repr(val))
+        return data
+
     def saveToFile(self):
         """Write seed file into the saves folder. Return wether successful.
 
         saveToFile() -> boolean"""
         #check folder exists
         if os.path.isdir("dat"):
-            #write data to new lines
+            #write data to lines (no trailing newline: it would add a line)
             f = open(self.filename,"w")
-            for line in self._data:
-                f.write(line+'\n')
+            f.write('\n'.join(self.fileData()))
             f.close()
+            seedFileCache.put(self.filename,self)
             return True
         return False
 
 
+class seedCache:
+    """A least-recently-used cache of loaded seed files, keyed by path.
+    Entries are only used while the file's modification time and size are
+    unchanged. A seed is cached as its typed field values, and every hit
+    builds a new seed from them, so callers can change the seeds they are
+    given without changing the cache.
+
+    Constructor: seedCache(int)
+    """
+
+    def __init__(self,capacity=256):
+        """Create an empty cache holding at most capacity files."""
+        self._entries=OrderedDict() #path -> (mtime,size,result), oldest first
+        self.capacity=capacity
+        self.hits=0
+        self.misses=0
+
+    def __len__(self):
+        """Return the number of cached files."""
+        return len(self._entries)
+
+    def _key(self,fname):
+        """Return the cache key for a file name."""
+        return os.path.normcase(os.path.abspath(fname))
+
+    def _stamp(self,st):
+        """Return the (mtime,size) identifying a version of a file."""
+        return (getattr(st,'st_mtime_ns',st.st_mtime),st.st_size)
+
+    def get(self,fname,st):
+        """Return the cached result for the file with the given os.stat
+        result, or None if it is not cached or has changed.
+
+        get(string,stat_result) -> seed or False or None
+        """
+        key=self._key(fname)
+        entry=self._entries.pop(key,None)
+        if entry is None or entry[0]!=self._stamp(st):
+            self.misses+=1
+            return None
+        self._entries[key]=entry
+        self.hits+=1
+        if entry[1] is False:
+            return False
+        return seed(*entry[1])
+
+    def put(self,fname,result,st=None):
+        """Store the load result (a seed, or False for invalid data) for the
+        file, evicting the least recently used files if over capacity.
+
+        put(string,seed or False,stat_result) -> void
+        """
+        if st is None:
+            st=os.stat(fname)
+        if result is not False:
+            #a copy of the seed's values, not the seed itself
+            result=(tuple([result.name]+result.values()),result.filename)
+        key=self._key(fname)
+        self._entries.pop(key,None)
+        self._entries[key]=(self._stamp(st),result)
+        self.resize(self.capacity)
+
+    def resize(self,capacity):
+        """Change the capacity, evicting the oldest files if needed.
+
+        resize(int) -> void
+        """
+        self.capacity=capacity
+        while len(self._entries)>max(capacity,0):
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Empty the cache and reset the hit/miss counters.
+
+        clear() -> void
+        """
+        self._entries.clear()
+        self.hits=0
+        self.misses=0
+
+
+#process-wide cache used by seedFile_load
+seedFileCache=seedCache()
+
+
 def fileExists(fileName):
     """Check if the given seed file name exists
 
@@ -127,7 +257,7 @@ def seedFile_check(fileData):
     """
     #check file size
     
-    if len(fileData)<>21:
+    if len(fileData)!=21:
         return False#'File Length'
     #iterate over numeric data
     for i in range(1,len(fileData)):
@@ -144,29 +274,145 @@ def seedFile_check(fileData):
             if not dataTypes[i][1]<=val<=dataTypes[i][2]:
                 return False#'Out of range'
             #check for integers
-            if dataTypes[i][0] and val%1<>0:
+            if dataTypes[i][0] and val%1!=0:
                 return False#'Not an integer'
     return True
 
 
+def seedFile_read(fname):
+    """Return the lines of the given seed file.
+
+    seedFile_read(string) -> list<string>
+    """
+    return open(fname,'U' if str is bytes else 'r').read().split('\n')
+
+
 def seedFile_load(fileName):
     """Check file exists and has valid content; return a seed data structure.
+    Results are kept in seedFileCache until the file changes.
 
     seed_load(string) -> seed or False or None
     """
     fname="dat"+chr(92)+fileName+'.sdf'
     if fileExists(fname):
+        st=os.stat(fname)
+        result=seedFileCache.get(fname,st)
+        if result is not None:
+            return result
         #read file
-        data=open(fname,'U').read().split('\n')
+        data=seedFile_read(fname)
         #check content
         if seedFile_check(data):
             #file data validated and returned
-            return seed(data,fname)
+            result=seed(data,fname)
         else:
             #file found, invalid data
-            return False
+            result=False
+        seedFileCache.put(fname,result,st)
+        return result
     #no file
     return None
 
 
+def seedFile_checkAll(filesData):
+    """Check many seed files' contents at once, with the same rules as
+    seedFile_check. Returns a list with, for each file, an empty list if it is
+    valid, or else the failed checks as (line number, field name, reason)
+    tuples. A wrong file length is reported as (None, None, 'File Length');
+    otherwise every failing numeric line is reported, with the first reason
+    seedFile_check would give: 'Blank', 'Not a number', 'Out of range' or
+    'Not an integer'.
+
+    seedFile_checkAll(list<list<string>>)
+        -> list<list<tuple<int,string,string>>>
+    """
+    errors=[[] for data in filesData]
+    rows=[]
+    for n in range(len(filesData)):
+        if len(filesData[n])!=21:
+            errors[n].append((None,None,'File Length'))
+        else:
+            rows.append(n)
+    if not rows:
+        return errors
+
+    #convert with float() in one pass; locate bad strings only if that fails
+    count=len(dataTypes)-1
+    try:
+        values=np.array([float(field) for n in rows
+                         for field in filesData[n][1:]]).reshape(-1,count)
+        blank=np.zeros(values.shape,bool)
+        nan=np.zeros(values.shape,bool)
+    except ValueError:
+        text=np.array([filesData[n][1:] for n in rows])
+        blank=(text=='')
+        nan=np.zeros(text.shape,bool)
+        values=np.empty(text.shape)
+        for index,field in np.ndenumerate(text):
+            try:
+                values[index]=float(field)
+            except ValueError:
+                values[index]=np.nan
+                nan[index]=True
+        nan&=~blank
+
+    isInt=np.array([t[0] for t in dataTypes[1:]])
+    lo=np.array([t[1] for t in dataTypes[1:]],float)
+    hi=np.array([t[2] for t in dataTypes[1:]],float)
+    number=~(blank|nan)
+    #comparisons with NaN are False: unparsed fields are never in range
+    inRange=(lo<=values)&(values<=hi)
+    outRange=number&~inRange
+    notInt=number&inRange&isInt&(values%1!=0)
+
+    code=np.select([blank,nan,outRange,notInt],[1,2,3,4],0)
+    reasons=[None,'Blank','Not a number','Out of range','Not an integer']
+    for r,f in zip(*np.nonzero(code)):
+        errors[rows[r]].append((int(f)+1,fieldNames[f+1],reasons[code[r,f]]))
+    return errors
+
+
+def seedFile_bulkLoad(folder,threads=8):
+    """Read and check every .sdf file in the folder, reading with a pool of
+    threads. Return the valid seeds, and a report mapping each rejected
+    file's name to its failed checks (see seedFile_checkAll).
+
+    seedFile_bulkLoad(string,int)
+        -> tuple<list<seed>,dict<string,list<tuple<int,string,string>>>>
+    """
+    names=sorted([f for f in os.listdir(folder) if f.endswith('.sdf')])
+    paths=[os.path.join(folder,f) for f in names]
+    pool=ThreadPool(threads)
+    try:
+        filesData=pool.map(seedFile_read,paths)
+    finally:
+        pool.close()
+        pool.join()
+
+    seeds=[]
+    report={}
+    errors=seedFile_checkAll(filesData)
+    for n in range(len(paths)):
+        if errors[n]:
+            report[names[n]]=errors[n]
+        else:
+            seeds.append(seed(filesData[n],paths[n]))
+    return seeds,report
+
+
+
+#instrumentation probes (see instrument.py)
+probe(seed, '__init__', 'seed', lambda result, *args: {'seeds parsed': 1})
+probe(seedCache, 'get', 'seedCache.get', lambda result, *args:
+      {'cache hits': int(result is not None),
+       'cache misses': int(result is None)})
+probe(globals(), 'seedFile_read', counts=lambda data, fname:
+      {'seed files read': 1})
+probe(globals(), 'seedFile_check', counts=lambda valid, data:
+      {'seed files checked': 1})
+probe(globals(), 'seedFile_checkAll', counts=lambda errors, filesData:
+      {'seed files checked': len(filesData)})
+probe(globals(), 'seedFile_load')
+probe(globals(), 'seedFile_bulkLoad')
+
 # ----------------------------------------------------------------------------
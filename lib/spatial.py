@@ -0,0 +1,292 @@
+"""
+PyPlant 1.0
+LIBRARY: Spatial Index
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+A spatial hash over plant positions on the terrain's floor (x-z) plane, for
+crowding, spacing and collision checks without comparing every plant with
+every other. Plants are bucketed into square cells and sorted by cell, so a
+bulk insert is one sort, and radius, box, nearest-neighbour and all-pairs
+queries only look at the cells they touch. Queries return index arrays.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import numpy as np
+
+# ------------------------------------------------------------------------------
+"""
+Each plant is a disc on the floor plane: its (x,z) centre and a bounding
+radius (0 for a point). Plant i is the ith plant inserted. Cell (cx,cz) covers
+    cx*cellsize <= x < (cx+1)*cellsize,  cz*cellsize <= z < (cz+1)*cellsize
+and is keyed cx*span+cz, relative to the lowest occupied cell, so a row of
+cells along z is one run of sorted keys. The grid is at most maxCells cells
+a side (so keys stay well within int64): when inserts spread the plants
+further, the cell size grows to match.
+Queries with overlap=True match plants whose disc touches the query shape;
+otherwise only plant centres are tested.
+"""
+# ------------------------------------------------------------------------------
+
+
+maxCells = 2**20
+
+
+def _ranges(lo, hi):
+    """Return the concatenation of range(lo[i], hi[i]) for every i, and the i
+        each value came from.
+    """
+    counts = np.maximum(hi-lo, 0)
+    owner = np.repeat(np.arange(len(lo)), counts)
+    starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - starts[owner] + lo[owner], owner
+
+
+def crownRadius(sk):
+    """Return a skeleton's bounding radius on the floor plane: the furthest
+        horizontal distance of any branch end from the stem base.
+
+    crownRadius(skeleton) -> float
+    """
+    if len(sk)==0:
+        return 0.
+    ends = np.vstack((sk.start, sk.ends()))
+    offset = ends[:,[0,2]] - sk.start[0,[0,2]]
+    return float(np.sqrt((offset**2).sum(1)).max())
+
+
+class plantIndex:
+    """A spatial hash of plant discs on the floor plane.
+
+    Constructor: plantIndex(float)
+
+    Class invariant:
+        cellsize>0 once any plants are inserted
+        and
+        the grid is at most maxCells cells on each side
+    """
+
+    def __init__(self, cellsize=None):
+        """Create an empty index. Without a cell size, one is chosen on
+            insert from the plants' spacing and radii, and chosen again if
+            later inserts spread them too far for it.
+        """
+
+        self.cellsize = cellsize
+        self._autoSize = cellsize is None
+        self._x = np.zeros(0)
+        self._z = np.zeros(0)
+        self._r = np.zeros(0)
+        self._maxR = 0.
+        self._order = np.zeros(0, np.int64)   #plant numbers sorted by cell
+        self._keys = np.zeros(0, np.int64)    #cell key of each, sorted
+        self._origin = (0, 0)
+        self._span = 1
+        self._rows = 0
+
+    def __len__(self):
+        """Return the number of plants in the index."""
+
+        return len(self._x)
+
+    def _chooseCellsize(self, x, z, r):
+        """Return a cell size giving a few plants per cell, and no smaller than
+            a typical plant. The spacing comes from the wider side of the
+            plants' bounding box, so plants in a line still share cells.
+        """
+        extent = max(np.ptp(x), np.ptp(z))
+        spacing = extent/np.sqrt(len(x))
+        return float(max(2*spacing, 2*np.median(r), extent/maxCells, 1e-6))
+
+    def _hash(self, cellsize):
+        """Bucket every plant into cells of the given size; return the plant
+            numbers sorted by cell, their sorted keys, the lowest cell and
+            the grid's span (along z) and rows (along x).
+        """
+        cx = np.floor(self._x/cellsize).astype(np.int64)
+        cz = np.floor(self._z/cellsize).astype(np.int64)
+        origin = (int(cx.min()), int(cz.min()))
+        span = int(cz.max()) - origin[1] + 1
+        rows = int(cx.max()) - origin[0] + 1
+        keys = (cx-origin[0])*span + (cz-origin[1])
+        order = np.argsort(keys, kind='mergesort')
+        return order, keys[order], origin, span, rows
+
+    def _cell(self, v):
+        """Return the cell coordinate of floor-plane coordinates (clipped to
+            the int64 range, for query shapes reaching far off the grid).
+        """
+        cell = np.floor(np.asarray(v, float)/self.cellsize)
+        return np.clip(cell, -2.**62, 2.**62).astype(np.int64)
+
+    def insert(self, positions, radii=0):
+        """Add plants at the given positions (x,z pairs, or x,y,z vectors
+            whose y is ignored) with bounding radii; return their plant
+            numbers. The whole index is re-sorted once per call, so insert
+            plants in bulk.
+
+        insert(array<tuple<float,float>> or array<vector>,
+               float or array<float>) -> array<int>
+        """
+        positions = np.asarray(positions, float).reshape(len(positions), -1)
+        x, z = positions[:,0], positions[:,-1]
+        r = np.broadcast_to(np.asarray(radii, float), x.shape)
+        first = len(self._x)
+        if len(x)==0:
+            return np.arange(first, first)
+
+        self._x = np.concatenate((self._x, x))
+        self._z = np.concatenate((self._z, z))
+        self._r = np.concatenate((self._r, r))
+        self._maxR = float(self._r.max())
+
+        #(re)size the cells if there is no size yet or the grid is too wide
+        extent = max(np.ptp(self._x), np.ptp(self._z))
+        if self.cellsize is None or extent/self.cellsize > maxCells-2:
+            if self._autoSize:
+                self.cellsize = self._chooseCellsize(self._x, self._z,
+                                                     self._r)
+            else:
+                self.cellsize = extent/(maxCells-2)
+
+        (self._order, self._keys, self._origin, self._span,
+         self._rows) = self._hash(self.cellsize)
+        return np.arange(first, len(self._x))
+
+    def positions(self):
+        """Return the (x,z) centre of every plant.
+
+        positions() -> array<tuple<float,float>>
+        """
+        return np.column_stack((self._x, self._z))
+
+    def radii(self):
+        """Return the bounding radius of every plant.
+
+        radii() -> array<float>
+        """
+        return self._r
+
+    def _candidates(self, x0, z0, x1, z1):
+        """Return the plants in every cell touching the given rectangle."""
+
+        if len(self._x)==0:
+            return np.zeros(0, np.int64)
+        ox, oz = self._origin
+        cx0 = max(int(self._cell(x0))-ox, 0)
+        cx1 = min(int(self._cell(x1))-ox, self._rows-1)
+        cz0 = max(int(self._cell(z0))-oz, 0)
+        cz1 = min(int(self._cell(z1))-oz, self._span-1)
+        if cx0 > cx1 or cz0 > cz1:
+            return np.zeros(0, np.int64)
+        rows = np.arange(cx0, cx1+1)*self._span
+        lo = np.searchsorted(self._keys, rows+cz0, 'left')
+        hi = np.searchsorted(self._keys, rows+cz1, 'right')
+        return self._order[_ranges(lo, hi)[0]]
+
+    def box(self, x0, z0, x1, z1, overlap=True):
+        """Return the plants inside (or, with overlap, touching) the
+            rectangle x0<=x<=x1, z0<=z<=z1, e.g. a terrain tile.
+
+        box(float, float, float, float, boolean) -> array<int>
+        """
+        pad = self._maxR if overlap else 0.
+        found = self._candidates(x0-pad, z0-pad, x1+pad, z1+pad)
+        x, z = self._x[found], self._z[found]
+        #distance from each centre to the rectangle
+        dx = np.maximum(np.maximum(x0-x, x-x1), 0)
+        dz = np.maximum(np.maximum(z0-z, z-z1), 0)
+        reach = self._r[found] if overlap else 0.
+        return np.sort(found[dx*dx + dz*dz <= reach*reach])
+
+    def radius(self, x, z, r, overlap=True):
+        """Return the plants within distance r of the point (x,z), or with
+            overlap, whose discs come within r of it.
+
+        radius(float, float, float, boolean) -> array<int>
+        """
+        pad = r + (self._maxR if overlap else 0.)
+        found = self._candidates(x-pad, z-pad, x+pad, z+pad)
+        reach = r + (self._r[found] if overlap else 0.)
+        d2 = (self._x[found]-x)**2 + (self._z[found]-z)**2
+        return np.sort(found[d2 <= reach*reach])
+
+    def nearest(self, x, z, k=1):
+        """Return the k plants with centres nearest to (x,z), nearest first,
+            and their distances. The search square grows until it holds the
+            k nearest, so the cost depends on local density, not plant count.
+
+        nearest(float, float, int) -> tuple<array<int>,array<float>>
+        """
+        k = min(k, len(self._x))
+        if k==0:
+            return np.zeros(0, np.int64), np.zeros(0)
+        half = self.cellsize
+        while True:
+            found = self._candidates(x-half, z-half, x+half, z+half)
+            if len(found) >= k:
+                d = np.sqrt((self._x[found]-x)**2 + (self._z[found]-z)**2)
+                best = np.lexsort((found, d))[:k]
+                #everything within the square's inscribed circle is certain
+                if d[best[-1]] <= half or len(found)==len(self._x):
+                    return found[best], d[best]
+            half *= 2
+
+    def pairs(self, distance, overlap=False):
+        """Return every pair of plants (i<j) whose centres are within the
+            given distance of each other, or with overlap, whose discs come
+            within it: two arrays, i and j. Plants are hashed into cells at
+            least as large as that reach, so each cell is only compared with
+            its neighbours.
+
+        pairs(float, boolean) -> tuple<array<int>,array<int>>
+        """
+        n = len(self._x)
+        if n==0:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        reach = distance + (2*self._maxR if overlap else 0.)
+        if reach > self.cellsize:
+            size = reach
+            order, keys, origin, span, rows = self._hash(size)
+        else:
+            size = self.cellsize
+            order, keys, origin, span = (self._order, self._keys,
+                                         self._origin, self._span)
+        sortedX, sortedZ = self._x[order], self._z[order]
+        cz = np.floor(sortedZ/size).astype(np.int64) - origin[1]
+        first, second = [], []
+        for dx in range(0, 2):
+            for dz in range(-1, 2):
+                if dx==0 and dz<0:
+                    continue   #each pair of cells is visited once
+                ok = (cz+dz >= 0) & (cz+dz < span)
+                src = np.nonzero(ok)[0]
+                target = keys[src] + dx*span + dz
+                lo = np.searchsorted(keys, target, 'left')
+                hi = np.searchsorted(keys, target, 'right')
+                if dx==0 and dz==0:
+                    lo = np.maximum(lo, src+1)   #same cell: later ones only
+                dst, owner = _ranges(lo, hi)
+                a, b = src[owner], dst
+                d2 = (sortedX[a]-sortedX[b])**2 + (sortedZ[a]-sortedZ[b])**2
+                i, j = order[a], order[b]
+                limit = distance + (self._r[i]+self._r[j] if overlap else 0.)
+                near = d2 <= limit*limit
+                first.append(np.minimum(i, j)[near])
+                second.append(np.maximum(i, j)[near])
+        i, j = np.concatenate(first), np.concatenate(second)
+        order = np.lexsort((j, i))
+        return i[order], j[order]
+
+
+# ----------------------------------------------------------------------------
@@ -0,0 +1,87 @@
+"""
+PyPlant 1.0
+LIBRARY: Random Streams
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Reproducible randomness for parallel generation. Every random value is
+derived from a master seed and a key saying what it is for (a plant's
+branch, or a terrain point), never from call order, so work can be split
+across threads or processes, or cached, without changing the results.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import numpy as np
+
+# ------------------------------------------------------------------------------
+"""
+Keyed values: uniform() hashes (master, key...) straight to a number, for
+arrays of keys at once, so the same value comes out however the work is
+ordered or chunked: per-branch growth variation (growth.py, keyed by plant
+and row) and terrain noise at a point shared by two tiles (terrain.py, keyed
+by the point). The hash is the SplitMix64 finaliser applied to each key in
+turn.
+"""
+# ------------------------------------------------------------------------------
+
+#key domains, so plant n and point (n,...) values never coincide
+PLANT, POINT = 1, 3
+
+_MASK = (1 << 64) - 1
+
+
+def _splitmix(z):
+    """SplitMix64 finaliser on a uint64 array (wrapping arithmetic)."""
+
+    z = z + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def mix(master, *keys):
+    """Return a 64 bit hash of the master seed and integer keys. Keys may be
+        arrays; the result has their broadcast shape.
+
+    mix(int, int or array<int>, ...) -> array<uint64>
+    """
+    keys = [np.asarray(k).astype(np.int64).view(np.uint64) for k in keys]
+    shape = np.broadcast(*keys).shape if keys else ()
+    h = np.full(shape, master & _MASK, np.uint64).reshape(-1)
+    h = _splitmix(h)
+    for k in keys:
+        h = _splitmix(h ^ np.broadcast_to(k, shape).reshape(-1))
+    return h.reshape(shape)
+
+
+def uniform(master, *keys):
+    """Return uniform values in [0,1) keyed by the master seed and keys.
+
+    uniform(int, int or array<int>, ...) -> array<float>
+    """
+    return (mix(master, *keys) >> np.uint64(11)) * 2.**-53
+
+
+def pointKeys(x, z, resolution=2**-20):
+    """Return integer keys for floor-plane points, with coordinates rounded
+        to the given resolution so that points computed slightly differently
+        (e.g. by neighbouring tiles) share a key.
+
+    pointKeys(array<float>, array<float>, float)
+        -> tuple<array<int>,array<int>>
+    """
+    return (np.round(np.asarray(x, float)/resolution).astype(np.int64),
+            np.round(np.asarray(z, float)/resolution).astype(np.int64))
+
+
+# ----------------------------------------------------------------------------
@@ -0,0 +1,212 @@
+"""
+PyPlant 1.0
+LIBRARY: Parameter Sweeps
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Maps the seed parameter space. Samples are drawn from the valid seed field
+ranges (grid, random or Latin hypercube), each sample's plant is grown
+headlessly on a pool of processes, and per-sample metrics are streamed into
+one results table. An interrupted sweep carries on where it stopped.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+import os
+from multiprocessing import Pool
+import numpy as np
+
+from seeds import seed, fieldNames
+from growth import generationSizes, streamSkeleton, skeletonStats
+from evolution import minVal, maxVal, constrain, plantStats
+
+# ------------------------------------------------------------------------------
+"""
+Samples are (N,20) matrices in the population layout of evolution.py: one
+row per sample, one column per numeric seed field. Fields that are not
+varied take their value from a base row (e.g. a loaded seed's values()).
+
+Results table (comma separated text, one header line):
+    sample, <the 20 field names>, branches, length, volume, grown
+grown is 1 if the plant was grown branch by branch, or 0 if it had more than
+maxBranches branches and the closed-form statistics were used instead.
+"""
+# ------------------------------------------------------------------------------
+
+resultColumns = (['sample'] + fieldNames[1:]
+                 + ['branches', 'length', 'volume', 'grown'])
+
+
+def _columns(fields):
+    """Return the matrix columns of the named fields (all if None)."""
+
+    if fields is None:
+        return list(range(len(minVal)))
+    return [fieldNames.index(f)-1 for f in fields]
+
+
+def _spread(unit, base, fields):
+    """Map unit-cube samples for the given fields onto their ranges, filling
+        the other fields from base.
+    """
+    cols = _columns(fields)
+    samples = np.tile(np.asarray(base, float), (len(unit), 1))
+    samples[:, cols] = minVal[cols] + unit*(maxVal[cols]-minVal[cols])
+    return constrain(samples)
+
+
+def gridSamples(levels, base):
+    """Return every combination of evenly spaced values (ends included) for
+        the fields named in levels, which maps field name to level count.
+
+    gridSamples(dict<string,int>, list<float>) -> array<array<float>>
+    """
+    fields = sorted(levels.keys(), key=fieldNames.index)
+    axes = [np.linspace(0, 1, levels[f]) for f in fields]
+    unit = np.array(np.meshgrid(*axes, indexing='ij')).reshape(len(fields), -1)
+    return _spread(unit.T, base, fields)
+
+
+def randomSamples(n, base, fields=None, rng=None):
+    """Return n samples drawn uniformly over the named fields' ranges.
+
+    randomSamples(int, list<float>, list<string>, RandomState)
+        -> array<array<float>>
+    """
+    if rng is None:
+        rng = np.random
+    return _spread(rng.random_sample((n, len(_columns(fields)))), base,
+                   fields)
+
+
+def latinHypercube(n, base, fields=None, rng=None):
+    """Return n Latin hypercube samples over the named fields' ranges: each
+        field's range is cut into n strata, and every stratum is used once.
+
+    latinHypercube(int, list<float>, list<string>, RandomState)
+        -> array<array<float>>
+    """
+    if rng is None:
+        rng = np.random
+    k = len(_columns(fields))
+    unit = (rng.random_sample((n, k)) + np.arange(n)[:, None])/n
+    for j in range(k):
+        unit[:, j] = unit[rng.permutation(n), j]
+    return _spread(unit, base, fields)
+
+
+def sampleMetrics(values, maxBranches=10**6, master=None, plant=0):
+    """Grow one sample's plant headlessly (as plant number plant, with branch
+        variation if a master seed is given); return (branches, length,
+        volume, grown) as described for the results table.
+
+    sampleMetrics(list<float>, int, int, int) -> tuple<float,float,float,int>
+    """
+    s = seed(['sample'] + list(values), None)
+    if sum(generationSizes(s)) > maxBranches:
+        stats = plantStats(np.array([s.values()], float))
+        return (float(stats['branches'][0]), float(stats['length'][0]),
+                float(stats['volume'][0]), 0)
+    stats = skeletonStats(streamSkeleton(s, master=master, plant=plant))
+    return (stats['branches'], stats['length'], stats['volume'], 1)
+
+
+def _sampleRow(job):
+    """Pool worker: grow sample job=(n, values, maxBranches, master); return
+        its results table line.
+    """
+    n, values, maxBranches, master = job
+    metrics = sampleMetrics(values, maxBranches, master, n)
+    return ','.join([str(n)] + [repr(float(v)) for v in values]
+                    + [repr(m) for m in metrics])
+
+
+def _complete(line):
+    """Return whether a results table line has every column, each a number
+        (the first a sample number).
+    """
+    fields = line.split(',')
+    if len(fields) != len(resultColumns):
+        return False
+    try:
+        int(fields[0])
+        for field in fields[1:]:
+            float(field)
+    except ValueError:
+        return False
+    return True
+
+
+def _finished(filename):
+    """Return the sample numbers already in the results table, dropping any
+        partly written last line left by an interruption. Only lines ended by
+        a newline are trusted, as a line is written before its newline.
+    """
+    lines = open(filename).read().split('\n')[:-1]
+    good = [line for line in lines[1:] if _complete(line)]
+    f = open(filename, 'w')
+    f.write('\n'.join([lines[0]] + good) + '\n')
+    f.close()
+    return set(int(line.split(',', 1)[0]) for line in good)
+
+
+def runSweep(samples, filename, processes=None, maxBranches=10**6,
+             chunksize=16, master=None):
+    """Grow every sample on a pool of processes (one per core by default),
+        appending each result to the results table as it arrives. The samples
+        are saved next to the table (filename+'.npy'); if a table is already
+        there, the sweep resumes, skipping finished samples.
+        With a master seed, sample n grows as plant n of that seed (see
+        streams.py), so results do not depend on how work is shared out.
+        Return the number of samples grown by this call.
+
+    runSweep(array<array<float>>, string, int, int, int, int) -> int
+    """
+    samples = np.asarray(samples, float)
+    sampleFile = filename + '.npy'
+    done = set()
+    if os.path.exists(filename) and os.path.exists(sampleFile):
+        if not np.array_equal(np.load(sampleFile), samples):
+            raise ValueError('samples differ from the sweep in ' + filename)
+        done = _finished(filename)
+    else:
+        np.save(sampleFile, samples)
+        f = open(filename, 'w')
+        f.write(','.join(resultColumns) + '\n')
+        f.close()
+
+    jobs = [(n, samples[n].tolist(), maxBranches, master)
+            for n in range(len(samples)) if n not in done]
+    out = open(filename, 'a')
+    pool = Pool(processes)
+    try:
+        for line in pool.imap_unordered(_sampleRow, jobs, chunksize):
+            out.write(line + '\n')
+            out.flush()
+    finally:
+        pool.terminate()
+        pool.join()
+        out.close()
+    return len(jobs)
+
+
+def loadResults(filename):
+    """Read a results table into an array, one row per finished sample,
+        sorted by sample number.
+
+    loadResults(string) -> array<array<float>>
+    """
+    table = np.loadtxt(filename, delimiter=',', skiprows=1, ndmin=2)
+    return table[np.argsort(table[:, 0])]
+
+
+# ----------------------------------------------------------------------------
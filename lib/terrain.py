@@ -19,8 +19,13 @@ I also grant the right to non-commercial use of the source code without my
 express permission. Commercial users must seek the permission of the author.
 """
 
-from visual import *
-from random import random
+import numpy as np
+from vectors import mag, cross
+from streams import uniform, pointKeys, POINT
+import meshes
+from meshes import meshBuffer, gridTriangles, gridNormals
+from renderers import visualRenderer
+from instrument import probe
 
 # -------------------------------------------------------------------------------------
 """
@@ -35,17 +40,54 @@ http://www.vpython.org/contents/docs/visual/display.html
 class model:
     """The base class for creating a custom 3D model in Vpython.
 
-    Constructor: model(display, color, boolean)
+    Geometry is built into a contiguous mesh buffer; nothing is drawn until
+    render() hands the buffer to the renderer (by default, Visual faces in
+    the given display; pass a renderers.nullRenderer to build headless).
+
+    Constructor: model(display, color, boolean, renderer, dtype)
     """
     
-    def __init__(self, window, color=(1,1,1), clipping=False):
+    def __init__(self, window, color=(1,1,1), clipping=False, renderer=None,
+                 dtype='float64'):
         """Initialise an empty model in the given display."""
         
         self._window = window
-        self._frame = frame(display=self._window)
-        self._poly = faces(frame=self._frame, display=self._window)
+        self._mesh = meshBuffer(dtype)
+        self._poly = None
         self._col = color
         self._clipping = clipping #single-sided 3d render
+        self._mesh.twoSided = not clipping
+        if renderer is None:
+            renderer = visualRenderer(window)
+        self._renderer = renderer
+
+    def getMesh(self):
+        """Return the model's mesh buffer.
+
+        getMesh() -> meshBuffer
+        """
+        return self._mesh
+
+    def render(self, shading=False):
+        """Hand the finished geometry to the renderer; return what it drew.
+            With shading, smooth vertex normals are computed first (so the
+            renderer has no smoothing left to do).
+
+        render(boolean) -> object
+        """
+        if shading:
+            self.smoothNormals()
+        self._poly = self._renderer.draw(self._mesh, False)
+        return self._poly
+
+    def smoothNormals(self, angle=0.95):
+        """Replace the flat triangle normals with area-weighted smooth vertex
+            normals, averaging faces that meet at a point within the given
+            angle (radians) of each other, like Vpython's faces.smooth().
+
+        smoothNormals(float) -> void
+        """
+        self._mesh.computeNormals(True, True, angle)
 
     def triNorm(self, vertices): 
         """Get a unit normal vector for the given pointlist triangle.
@@ -69,13 +111,10 @@ class model:
         norm=self.triNorm(vertices)
         
         #add the triangle to the model
+        base=len(self._mesh)
         for vertex in vertices:
-            self._poly.append( pos=vertex,color=self._col,normal=norm )
-            
-        #for two-sided drawing, add reversed vertices/normals
-        if self._clipping==False:
-            for vertex in (vertices[0],vertices[2],vertices[1]):                
-                self._poly.append( pos=vertex,color=self._col,normal=-norm )
+            self._mesh.append( tuple(vertex),tuple(norm),self._col )
+        self._mesh.addFace(base,base+1,base+2)
 
     def addPolygon(self, vertices):
         """Add an n-sided polygon to the model.
@@ -86,16 +125,36 @@ class model:
         """
         
         #create a fan pattern of triangles around the polygon
-        for x in range(len(vertices)-2):
-            self.addTriangle( (vector(vertices[0]),vector(vertices[x+1]),
-                               vector(vertices[x+2])) )
+        vertices = np.asarray(vertices, float)
+        fan = np.arange(1, len(vertices)-1)
+        self.addTriangles(np.stack((np.zeros(len(fan),int), fan, fan+1), 1),
+                          vertices)
+
+    def addTriangles(self, triangles, points):
+        """Append many triangular faces at once: triangles indexes the given
+            points, three per face. Normals for all of them come from one
+            batched cross product.
+
+        addTriangles(array<tuple<int,int,int>>, array<vector>) -> void
+        Precondition:   no triangle has zero area
+        """
+        points = np.asarray(points, float)
+        corners = points[np.asarray(triangles, np.int64)]
+        n = len(corners)
+        norm = meshes.faceNormals(points, triangles)   #probed in meshes.py
+        faces = np.arange(3*n, dtype=np.uint32).reshape(n,3)
+
+        base = self._mesh.extend(corners.reshape(-1,3),
+                                 np.repeat(norm, 3, axis=0), self._col)
+        self._mesh.extendFaces(faces, base)
 
         
 class gridMesh(model):
     """Specialisation of model: a 3d grid-coordinate mesh generator.
 
-    Constructor: gridMesh(display, color, list<float>, list<float>,
-                            list<list<float>>, color, boolean, boolean)
+    Constructor: gridMesh(display, list<float>, list<float>,
+                            list<list<float>>, color, boolean, boolean,
+                            renderer, dtype)
 
     Class invariant:
         len(xlist)>1
@@ -108,74 +167,261 @@ class gridMesh(model):
     """    
     
     def __init__(self, window, xlist, zlist, ygrid, color=(1,1,1),
-                 shading=False, clipping=False):
-        """Create empty model; fill with polygons constructed from coordinate
-            lists.
+                 shading=False, clipping=False, renderer=None,
+                 dtype='float64'):
+        """Create empty model; fill with one shared vertex per grid point and
+            an index buffer covering every grid square, then render it.
+            Vertex normals are taken from the height field's gradient; without
+            shading, the mesh is drawn flat (see meshBuffer).
         """
         
-        model.__init__(self, window, color, clipping)
-        
-        #for each x-z point pair (excluding the end row/column)
-        for i in range(len(xlist)-2):
-            for j in range(len(zlist)-2):
-                #create a four-vertex polygon- the terrain square for this point
-                self.addPolygon(( (xlist[i],  ygrid[i][j],    zlist[j]),
-                                  (xlist[i],  ygrid[i][j+1],  zlist[j+1]),
-                                  (xlist[i+1],ygrid[i+1][j+1],zlist[j+1]),
-                                  (xlist[i+1],ygrid[i+1][j],  zlist[j])  ))
-        #smooth texture shading
-        if shading:
-            self._poly.smooth()
+        model.__init__(self, window, color, clipping, renderer, dtype)
+
+        xlist = np.asarray(xlist, float)
+        zlist = np.asarray(zlist, float)
+        nx, nz = len(xlist), len(zlist)
+        #keep the height field (in the model's precision) for sampling
+        self._xlist = xlist
+        self._zlist = zlist
+        self._heights = np.asarray(ygrid, dtype)
+
+        #one vertex per x-z point pair
+        points = np.empty((nx,nz,3))
+        points[...,0] = xlist[:,None]
+        points[...,1] = ygrid
+        points[...,2] = zlist[None,:]
+        base = self._mesh.extend(points.reshape(-1,3),
+                                 gridNormals(xlist,zlist,ygrid).reshape(-1,3),
+                                 self._col)
+
+        #two triangles per terrain square, for the whole grid at once; back
+        #faces (if two-sided) and flat normals are made when it is drawn
+        self._mesh.extendFaces(gridTriangles(nx,nz), base)
+        self._mesh.flat = not shading
+        #draw; smoothing is already done (gradient normals) if requested
+        self.render(shading)
             #NB: smoothing time  <2ms for a 5000-point model
             #    only need to run once (after finishing model)
             #    i.e. very fast - always use it if it looks better
 
+    def smoothNormals(self, angle=0.95):
+        """Grid normals are already smooth (from the height field's
+            gradient), so only stop drawing the grid flat.
+
+        smoothNormals(float) -> void
+        """
+        self._mesh.flat = False
+
+    def heightGrid(self):
+        """Return the grid's x list, z list and heights, where heights[i][j]
+            is the height at (xlist[i],zlist[j]).
+
+        heightGrid() -> tuple<array<float>,array<float>,array<array<float>>>
+        """
+        return self._xlist, self._zlist, self._heights
+
+    def sample_heights(self, points, normals=False):
+        """Return the terrain height under each point by bilinear
+            interpolation of the height field; points outside the grid take
+            the height at the nearest edge. points is an array of x-z pairs
+            (or x,y,z vectors, whose y is ignored), of any leading shape.
+            With normals, also return the unit surface normal at each point.
+
+        sample_heights(array<tuple<float,float>>, boolean)
+            -> array<float> or tuple<array<float>,array<vector>>
+        """
+        points = np.asarray(points, float)
+        x, z = points[...,0], points[...,-1]
+        xlist, zlist, h = self._xlist, self._zlist, self._heights
+
+        #grid square containing each point, and the position within it
+        i = np.clip(np.searchsorted(xlist, x, 'right')-1, 0, len(xlist)-2)
+        j = np.clip(np.searchsorted(zlist, z, 'right')-1, 0, len(zlist)-2)
+        dx = xlist[i+1]-xlist[i]
+        dz = zlist[j+1]-zlist[j]
+        u = np.clip((x-xlist[i])/dx, 0, 1)
+        v = np.clip((z-zlist[j])/dz, 0, 1)
+
+        h00, h01 = h[i,j], h[i,j+1]
+        h10, h11 = h[i+1,j], h[i+1,j+1]
+        low = h00 + (h10-h00)*u
+        high = h01 + (h11-h01)*u
+        heights = low + (high-low)*v
+        if not normals:
+            return heights
+
+        #slopes of the bilinear surface along x and z
+        slopeX = ((h10-h00)*(1-v) + (h11-h01)*v)/dx
+        slopeZ = (high-low)/dz
+        norm = np.stack((-slopeX, np.ones(slopeX.shape), -slopeZ), -1)
+        norm /= np.sqrt((norm**2).sum(-1))[...,None]
+        return heights, norm
+
 
 class terrain_feature(gridMesh):
     """Specialisation of gridMesh: generates a terrain grid-coordinate map and
         builds the 3d model
 
     Constructor: terrain_hill(display,float,float,function,float,float,color,
-                                boolean,boolean)
+                                boolean,boolean,renderer,dtype,RandomState,
+                                int)
 
     Class invariant:
         gridcount>2
         gridsize>0
         Yfunction takes 4 float arguments
+
+    Yfunction is first called once with whole (gridcount,gridcount) arrays of
+    x and z values; if that fails or does not return a matching array (e.g.
+    a function written for single points), it is called once per point.
+    An rng or master seed, if given, is passed on to Yfunction as a keyword
+    argument (as hillHeight takes them), for repeatable terrain.
     """  
     
     def __init__(self,window,gridcount,gridsize,Yfunction,arg1=0,arg2=0,
-                 color=(1,1,1),shading=False,clipping=True):
+                 color=(1,1,1),shading=False,clipping=True,renderer=None,
+                 dtype='float64',rng=None,master=None):
         """Generates the terrain's coordinate lists, based on input paramters
             and an external height-finding function.
         """
 
         #setup grid of evenly spaced x-y values around origin
-        xlist = arange(-gridcount*gridsize*0.5,gridcount*gridsize*0.5,gridsize)
+        xlist = np.arange(-gridcount*gridsize*0.5,gridcount*gridsize*0.5,
+                          gridsize)
         zlist = xlist
 
-        #generate height values
-        ygrid = []
-        for i in xlist:
-            tempList = []
-            for j in zlist:
-                tempList.append(Yfunction(i,j,arg1,arg2))
-            ygrid.append(tempList)
+        #generate height values, from the given random source if any
+        options = {}
+        if rng is not None:
+            options['rng'] = rng
+        if master is not None:
+            options['master'] = master
+        ygrid = heightField(Yfunction,xlist,zlist,arg1,arg2,**options)
 
         #pass point lists to the meshGrid-Model initialiser
-        gridMesh.__init__(self,window,xlist,zlist,ygrid,color,shading,clipping)
+        gridMesh.__init__(self,window,xlist,zlist,ygrid,color,shading,clipping,
+                          renderer,dtype)
+
+
+class terrain_tile(gridMesh):
+    """Specialisation of gridMesh: one square tile of a larger terrain, at a
+        given resolution.
+
+    The tile covers x in [tx*tilesize,(tx+1)*tilesize] and likewise for z,
+    with cells+1 points per side, so neighbouring tiles share their edge
+    coordinates exactly. Edge heights are sampled only every
+    cells/edgecells points and linearly interpolated in between: as long as
+    every level of detail uses the same edgecells, adjacent tiles at
+    different resolutions meet without cracks.
+
+    Constructor: terrain_tile(display,int,int,float,int,function,float,float,
+                              int,color,boolean,boolean,renderer,dtype,int)
+
+    Class invariant:
+        tilesize>0
+        cells%edgecells==0
+        Yfunction gives the same height for the same (x,z) on every call
+    """
 
+    def __init__(self,window,tx,tz,tilesize,cells,Yfunction,arg1=0,arg2=0,
+                 edgecells=None,color=(1,1,1),shading=False,clipping=True,
+                 renderer=None,dtype='float64',master=None):
+        """Generates the tile's coordinate lists and heights (passing the
+            master seed, if given, on to Yfunction).
+        """
+
+        self.tx = tx
+        self.tz = tz
+        self.cells = cells
+        xlist = np.linspace(tx*tilesize,(tx+1)*tilesize,cells+1)
+        zlist = np.linspace(tz*tilesize,(tz+1)*tilesize,cells+1)
+        options = {}
+        if master is not None:
+            options['master'] = master
+        ygrid = heightField(Yfunction,xlist,zlist,arg1,arg2,**options)
+
+        #constrain the four edges to the coarse edge resolution
+        if edgecells is not None and edgecells<cells:
+            step = cells//edgecells
+            points = np.arange(cells+1)
+            for edge in (ygrid[0,:],ygrid[-1,:],ygrid[:,0],ygrid[:,-1]):
+                edge[:] = np.interp(points,points[::step],edge[::step])
+
+        gridMesh.__init__(self,window,xlist,zlist,ygrid,color,shading,clipping,
+                          renderer,dtype)
+
+
+def heightField(Yfunction,xlist,zlist,arg1=0,arg2=0,**options):
+    """Evaluate a height function over every x-z pair of the given lists.
+    Returns a (len(xlist),len(zlist)) array, where [i][j] is the height at
+    (xlist[i],zlist[j]). Any keyword options (e.g. rng or master) are passed
+    on to every Yfunction call.
+
+    The function is tried once on whole meshgrid arrays; functions that only
+    handle single points fall back to one call per point.
 
-def hillHeight(x,z,hillsize, slope):
+    heightField(function,list<float>,list<float>,float,float,...)
+        -> array<array<float>>
+    """
+    X,Z = np.meshgrid(np.asarray(xlist,float),np.asarray(zlist,float),
+                      indexing='ij')
+    try:
+        ygrid = np.asarray(Yfunction(X,Z,arg1,arg2,**options),dtype=float)
+        if ygrid.shape==X.shape:
+            return ygrid
+    except (TypeError,ValueError):
+        pass
+    #scalar height function: evaluate point by point
+    ygrid = np.empty(X.shape)
+    for i in range(X.shape[0]):
+        for j in range(X.shape[1]):
+            ygrid[i,j] = Yfunction(X[i,j],Z[i,j],arg1,arg2,**options)
+    return ygrid
+
+
+def hillHeight(x,z,hillsize, slope, rng=None, master=None):
     """A height calculation for generating hilly terrain.
-    Returns the y-value (height) of the point on the given hill.
+    Returns the y-value (height) of the point(s) on the given hill.
 
-    hillHeight(float,float,float,float) -> float
+    x and z may be floats or arrays of matching shape. The random roughness
+    is drawn from rng, a numpy RandomState (NumPy's global one if not given);
+    bind a seeded one with functools.partial for repeatable terrain. If a
+    master seed is given instead, the roughness is keyed by the point itself
+    (see streams.py), so it is the same in any order, tile or process - as
+    terrain tiles need for their shared edges.
+
+    hillHeight(float,float,float,float,RandomState,int) -> float
     Precondition: hillsize>0
     """
-    dist = (x**2+z**2)**(slope*4)
-    if dist>hillsize:
-        dist=hillsize
-    return -dist*slope *(1-(1-2*random())*0.075)
+    dist = np.minimum((np.asarray(x)**2+np.asarray(z)**2)**(slope*4),hillsize)
+    if master is not None:
+        kx,kz = pointKeys(x,z)
+        noise = uniform(master,POINT,kx,kz)
+    else:
+        if rng is None:
+            rng = np.random
+        noise = rng.random_sample(dist.shape)
+    height = -dist*slope *(1-(1-2*noise)*0.075)
+    if height.ndim==0:
+        return float(height)
+    return height
+
+
+#instrumentation probes (see instrument.py)
+probe(model, 'triNorm', counts=lambda result, self, vertices: {'normals': 1})
+probe(model, 'addTriangle',
+      counts=lambda result, self, vertices: {'triangles added': 1})
+probe(model, 'addPolygon', counts=lambda result, self, vertices:
+      {'polygons': 1, 'fan triangles': len(vertices)-2})
+probe(model, 'addTriangles', counts=lambda result, self, triangles, points:
+      {'triangles added': len(triangles)})
+probe(model, 'smoothNormals')
+probe(model, 'render', counts=lambda result, self, shading=False:
+      {'models drawn': 1, 'vertices drawn': len(self._mesh),
+       'triangles drawn': self._mesh.drawnFaceCount()})
+probe(gridMesh, '__init__', 'gridMesh')
+probe(globals(), 'heightField', 'height',
+      counts=lambda ygrid, *args, **options: {'heights': ygrid.size})
+probe(globals(), 'hillHeight')
 
 # ------------------------------------------------------------------------------
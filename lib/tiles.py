@@ -0,0 +1,198 @@
+"""
+PyPlant 1.0
+LIBRARY: Tiled Terrain
+
+Copyright(c) 2010 Chris Ponticello
+s4234549@student.uq.edu.au
+
+DESCRIPTION:
+Manages a large landscape as a grid of terrain tiles. Tiles are generated on
+demand at a level of detail chosen by their distance from a viewpoint, and
+built tiles are kept in a least-recently-used cache with a memory cap, so a
+landscape only costs what is currently in view.
+
+LICENSE:
+I, Chris Ponticello, hereby grant the rights to copy, redistribute, modify and
+otherwise edit any source code file included within PyPlant 1.0, provided that
+this license agreement and my ownership of the code is maintained and
+acknowledged.
+
+I also grant the right to non-commercial use of the source code without my
+express permission. Commercial users must seek the permission of the author.
+"""
+
+from math import floor, ceil, log
+from collections import OrderedDict
+
+from terrain import terrain_tile
+from renderers import nullRenderer
+
+# ------------------------------------------------------------------------------
+"""
+Tile coordinates: tile (tx,tz) covers the floor-plane square
+    tx*tilesize <= x <= (tx+1)*tilesize,  tz*tilesize <= z <= (tz+1)*tilesize
+Level of detail 0 is the finest: a tile at level n has cells>>n squares per
+side. Every level constrains tile edges to the coarsest level's resolution
+(see terrain.terrain_tile), so neighbouring tiles never crack.
+"""
+# ------------------------------------------------------------------------------
+
+
+class tiledTerrain:
+    """A lazily generated, level-of-detail terrain made of cached tiles.
+
+    Constructor: tiledTerrain(function,float,float,float,int,int,float,int,
+                              color,boolean,boolean,renderer,dtype,int)
+
+    Class invariant:
+        tilesize>0
+        levels>0
+        cells%(2**(levels-1))==0
+        Yfunction gives the same height for the same (x,z) on every call
+    """
+
+    def __init__(self, Yfunction, arg1=0, arg2=0, tilesize=16., cells=64,
+                 levels=4, loddistance=None, memorycap=64*2**20,
+                 color=(1,1,1), shading=False, clipping=True, renderer=None,
+                 dtype='float64', master=None):
+        """Set up an empty tile cache. Tiles are drawn with renderer (none if
+            not given); loddistance is the distance within which tiles are
+            built at full detail (default: two tiles), doubling per level.
+            A master seed, if given, is passed on to Yfunction (as hillHeight
+            takes it), so the terrain is the same whatever order tiles are
+            built in.
+        """
+
+        self._Yfunction = Yfunction
+        self._master = master
+        self._args = (arg1, arg2)
+        self.tilesize = float(tilesize)
+        self.cells = cells
+        self.levels = levels
+        self.edgecells = cells >> (levels-1)
+        if loddistance is None:
+            loddistance = 2*self.tilesize
+        self.loddistance = float(loddistance)
+        self.memorycap = memorycap
+        self._col = color
+        self._shading = shading
+        self._clipping = clipping
+        self._dtype = dtype
+        self._renderer = renderer
+        self._builder = nullRenderer()
+
+        self._cache = OrderedDict() #(tx,tz,lod) -> terrain_tile, oldest first
+        self._bytes = 0
+        self._drawn = {}            #(tx,tz,lod) -> renderer's drawn object
+        self.hits = 0
+        self.misses = 0
+
+    def tileLevel(self, tx, tz, viewpoint):
+        """Return the level of detail for a tile seen from the viewpoint.
+
+        tileLevel(int,int,tuple<float,float,float>) -> int
+        """
+        half = 0.5*self.tilesize
+        dx = (tx*self.tilesize + half) - viewpoint[0]
+        dz = (tz*self.tilesize + half) - viewpoint[2]
+        dist = (dx**2 + dz**2)**0.5
+        if dist <= self.loddistance:
+            return 0
+        lod = int(floor(log(dist/self.loddistance, 2))) + 1
+        return min(lod, self.levels-1)
+
+    def getTile(self, tx, tz, lod):
+        """Return the tile at the given level of detail, building it if it is
+            not cached.
+
+        getTile(int,int,int) -> terrain_tile
+        """
+        key = (tx, tz, lod)
+        tile = self._cache.pop(key, None)
+        if tile is not None:
+            self.hits += 1
+            self._cache[key] = tile
+            return tile
+
+        self.misses += 1
+        tile = terrain_tile(None, tx, tz, self.tilesize, self.cells >> lod,
+                            self._Yfunction, self._args[0], self._args[1],
+                            self.edgecells, self._col, self._shading,
+                            self._clipping, self._builder, self._dtype,
+                            self._master)
+        self._cache[key] = tile
+        self._bytes += tile.getMesh().nbytes()
+        return tile
+
+    def _evict(self, keep=()):
+        """Drop least recently used tiles until under the memory cap. Tiles
+            whose keys are in keep are never dropped.
+        """
+        for key in list(self._cache.keys()):
+            if self._bytes <= self.memorycap:
+                break
+            if key in keep:
+                continue
+            tile = self._cache.pop(key)
+            self._bytes -= tile.getMesh().nbytes()
+            if key in self._drawn:
+                self._renderer.erase(self._drawn.pop(key))
+
+    def visibleTiles(self, viewpoint, viewrange):
+        """Return the (tx,tz,lod) keys of every tile within viewrange of the
+            viewpoint on the floor plane.
+
+        visibleTiles(tuple<float,float,float>,float) -> list<tuple<int,int,int>>
+        """
+        size = self.tilesize
+        x, z = viewpoint[0], viewpoint[2]
+        keys = []
+        for tx in range(int(floor((x-viewrange)/size)),
+                        int(ceil((x+viewrange)/size))):
+            for tz in range(int(floor((z-viewrange)/size)),
+                            int(ceil((z+viewrange)/size))):
+                #nearest point of the tile to the viewpoint
+                nx = min(max(x, tx*size), (tx+1)*size)
+                nz = min(max(z, tz*size), (tz+1)*size)
+                if (nx-x)**2 + (nz-z)**2 <= viewrange**2:
+                    keys.append((tx, tz, self.tileLevel(tx, tz, viewpoint)))
+        return keys
+
+    def update(self, viewpoint, viewrange):
+        """Make the tiles around the viewpoint current: build missing ones,
+            redraw those that changed level, and evict old tiles if over the
+            memory cap. Return the current tiles.
+
+        update(tuple<float,float,float>,float) -> list<terrain_tile>
+        """
+        keys = self.visibleTiles(viewpoint, viewrange)
+        tiles = [self.getTile(*key) for key in keys]
+
+        if self._renderer is not None:
+            current = set(keys)
+            for key in list(self._drawn.keys()):
+                if key not in current:
+                    self._renderer.erase(self._drawn.pop(key))
+            for key, tile in zip(keys, tiles):
+                if key not in self._drawn:
+                    #tiles already carry their shading (gradient normals)
+                    self._drawn[key] = self._renderer.draw(tile.getMesh(),
+                                                           False)
+
+        self._evict(set(keys))
+        return tiles
+
+    def nbytes(self):
+        """Return the memory used by cached tile meshes, in bytes.
+
+        nbytes() -> int
+        """
+        return self._bytes
+
+    def __len__(self):
+        """Return the number of cached tiles."""
+
+        return len(self._cache)
+
+
+# ----------------------------------------------------------------------------
@@ -20,13 +20,21 @@ I also grant the right to non-commercial use of the source code without my
 express permission. Commercial users must seek the permission of the author.
 """
 
-from visual import *
-from math import sqrt,pi,radians,degrees,atan,asin
+from math import sqrt,pi,radians,degrees,atan,asin,cos,sin
+import numpy as np
+from instrument import probe
 
 
 # -------------------------------------------------------------------------------------
 """
-Using vectors in my library: vector input/output uses the Vpython vector class.
+Using vectors in my library: vector input/output uses the vector class below,
+a light (x,y,z) object with the same interface as the Vpython vector class
+(x/y/z, mag, norm(), dot(), cross(), rotate() and the mag, cross and rotate
+functions). It works on plain floats with the math module, as single vectors
+are too small for NumPy to pay off; whole arrays of vectors go through the
+batched functions further down. Vpython vectors and (x,y,z) sequences are
+accepted as input, but Visual itself is not needed - it is only imported by
+the renderer, when something is drawn.
 
 Vectors in Vpython: the y-direction (not z) is treated as 'up' in the world.
 Therefore mathematics for this library has been modified so that all operations
@@ -40,6 +48,211 @@ NB: ANGLES IN RADIANS
 # ------------------------------------------------------------------------------
 
 
+class vector(object):
+    """A 3d vector of floats (x,y,z), usable anywhere Vpython vectors are:
+        adding and subtracting vectors or (x,y,z) sequences, scaling by
+        numbers, indexing, iteration, and == and != comparing whole vectors.
+        np.asarray(v) gives a (3,) float array.
+
+    Constructor: vector(float,float,float) or vector(tuple<float,float,float>)
+    """
+    __slots__ = ('x', 'y', 'z')
+    __array_ufunc__ = None      #NumPy leaves arithmetic to the methods below
+
+    def __init__(self, x=0., y=0., z=0.):
+        """Create a vector from three components or one 3-sequence."""
+
+        if hasattr(x, '__len__'):
+            x, y, z = x
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __add__(self, other):
+        try:
+            x, y, z = _components(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+        return _vector(self.x+x, self.y+y, self.z+z)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        try:
+            x, y, z = _components(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+        return _vector(self.x-x, self.y-y, self.z-z)
+
+    def __rsub__(self, other):
+        try:
+            x, y, z = _components(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+        return _vector(x-self.x, y-self.y, z-self.z)
+
+    def __mul__(self, k):
+        if isinstance(k, vector):
+            return NotImplemented
+        return _vector(self.x*k, self.y*k, self.z*k)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, k):
+        if isinstance(k, vector):
+            return NotImplemented
+        return _vector(self.x/k, self.y/k, self.z/k)
+
+    __div__ = __truediv__
+
+    def __neg__(self):
+        return _vector(-self.x, -self.y, -self.z)
+
+    def __pos__(self):
+        return _vector(self.x, self.y, self.z)
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __getitem__(self, index):
+        """Return a component (or a tuple of them, for a slice)."""
+
+        return (self.x, self.y, self.z)[index]
+
+    def __setitem__(self, index, value):
+        setattr(self, self.__slots__[index], float(value))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array((self.x, self.y, self.z), dtype or float)
+
+    def __eq__(self, other):
+        """Return whether other is a vector with the same components."""
+
+        try:
+            return tuple(_components(other))==(self.x, self.y, self.z)
+        except (TypeError, ValueError):
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return (self.x, self.y, self.z)
+
+    def __setstate__(self, state):
+        self.x, self.y, self.z = state
+
+    @property
+    def mag(self):
+        """The vector's length."""
+        return sqrt(self.x*self.x+self.y*self.y+self.z*self.z)
+
+    @property
+    def mag2(self):
+        """The vector's squared length."""
+        return self.x*self.x+self.y*self.y+self.z*self.z
+
+    def norm(self):
+        """Return the unit vector in the same direction (or zero).
+
+        norm() -> vector
+        """
+        length = self.mag
+        if length==0:
+            return vector(0,0,0)
+        return self*(1./length)
+
+    def dot(self, other):
+        """Return the dot product with another vector.
+
+        dot(vector) -> float
+        """
+        x, y, z = _components(other)
+        return self.x*x+self.y*y+self.z*z
+
+    def cross(self, other):
+        """Return the cross product with another vector.
+
+        cross(vector) -> vector
+        """
+        return cross(self, other)
+
+    def rotate(self, angle, axis=(0,0,1)):
+        """Return the vector rotated by angle (right-handed) about axis.
+
+        rotate(float,vector) -> vector
+        """
+        return rotate(self, angle, axis)
+
+    def __repr__(self):
+        return 'vector(%g, %g, %g)' % (self.x, self.y, self.z)
+
+    __str__ = __repr__
+
+
+def _vector(x, y, z):
+    """Return a vector of three floats, skipping the constructor's checks."""
+
+    v = object.__new__(vector)
+    v.x = x
+    v.y = y
+    v.z = z
+    return v
+
+
+def _components(vec):
+    """Return the (x,y,z) of a vector, Vpython vector or 3-sequence."""
+
+    if isinstance(vec, vector):
+        return vec.x, vec.y, vec.z
+    x, y, z = vec
+    return float(x), float(y), float(z)
+
+
+def mag(vec):
+    """Return the length of a vector.
+
+    mag(vector) -> float
+    """
+    x, y, z = _components(vec)
+    return sqrt(x*x+y*y+z*z)
+
+
+def cross(a, b):
+    """Return the cross product of two vectors.
+
+    cross(vector,vector) -> vector
+    """
+    ax, ay, az = _components(a)
+    bx, by, bz = _components(b)
+    return _vector(ay*bz-az*by, az*bx-ax*bz, ax*by-ay*bx)
+
+
+def rotate(vec, angle, axis=(0,0,1)):
+    """Return the vector rotated by angle (right-handed, as in Vpython)
+        about the given axis, by Rodrigues' rotation formula.
+
+    rotate(vector,float,vector) -> vector
+    Precondition: mag(axis)>0
+    """
+    x, y, z = _components(vec)
+    kx, ky, kz = _components(axis)
+    scale = 1./sqrt(kx*kx+ky*ky+kz*kz)
+    kx, ky, kz = kx*scale, ky*scale, kz*scale
+    c, s = cos(angle), sin(angle)
+    along = (kx*x+ky*y+kz*z)*(1-c)
+    return _vector(x*c + (ky*z-kz*y)*s + kx*along,
+                   y*c + (kz*x-kx*z)*s + ky*along,
+                   z*c + (kx*y-ky*x)*s + kz*along)
+
+
 def direction(dx,dy,allow_negative=False):
     """Return the direction angle for the given displacement.
 
@@ -102,7 +315,10 @@ def vec_yRotate(vec,angle):
         #x=cos(angle)*vec.x - sin(angle)*vec.z
         #z=sin(angle)*vec.x + cos(angle)*vec.z
         #return vector(x,vec.y,z)
-    return rotate(vec, angle, (0,1,0))    
+    #as rotate(vec, angle, (0,1,0)), written out
+    x, y, z = _components(vec)
+    c, s = cos(angle), sin(angle)
+    return _vector(c*x + s*z, y, c*z - s*x)
 
 
 def vec_zRotate(vec,angle):
@@ -119,7 +335,10 @@ def vec_zRotate(vec,angle):
         #x=cos(angle)*vec.x - sin(angle)*vec.y
         #y=sin(angle)*vec.x + cos(angle)*vec.y
         #return vector(x,y,vec.z )
-    return rotate(vec, angle, (0,0,1))
+    #as rotate(vec, angle, (0,0,1)), written out
+    x, y, z = _components(vec)
+    c, s = cos(angle), sin(angle)
+    return _vector(c*x - s*y, s*x + c*y, z)
 
 
 def vec_set_len(vec,length):
@@ -158,6 +377,117 @@ def vec_branch(parent_vec,split,rotation,length):
     #rotate about xz plane (direction)
     vec_ini = vec_yRotate(vec_ini,vec_dir(parent_vec))
     return vec_ini
-    
+
+
+# ------------------------------------------------------------------------------
+"""
+Batched versions: the same operations applied to whole arrays of vectors.
+
+Vectors are passed as (N,3) float arrays of (x,y,z) rows, angles and lengths
+as length-N arrays (or plain floats, which are broadcast). Each function
+reproduces its scalar counterpart above exactly, including the special cases
+in direction(), so a whole generation of branches can be positioned in one
+call instead of N.
+"""
+# ------------------------------------------------------------------------------
+
+
+def vecs_direction(dx,dy,allow_negative=False):
+    """Return the direction angles for the given arrays of displacements.
+
+    vecs_direction(array<float>,array<float>,boolean) -> array<float>
+    """
+    dx = np.asarray(dx,dtype=float)
+    dy = np.asarray(dy,dtype=float)
+    #special case: x==0; substitute 1 to keep the division quiet
+    zero = (dx==0)
+    angle = np.arctan(dy/np.where(zero,1.,dx))
+    if not allow_negative:
+        angle = np.where(dx<0, angle+pi, np.where(dy<0, angle+2*pi, angle))
+    return np.where(zero, np.where(dy==0, 0., pi/2), angle)
+
+
+def vecs_dir(vecs):
+    """Return the direction angle of each vector.
+
+    vecs_dir(array<vector>) -> array<float>
+    """
+    vecs = np.asarray(vecs,dtype=float)
+    return vecs_direction(vecs[:,0],vecs[:,2])
+
+
+def vecs_alt(vecs):
+    """Return the altitude angle of each vector.
+
+    vecs_alt(array<vector>) -> array<float>
+    """
+    vecs = np.asarray(vecs,dtype=float)
+    dx = np.sqrt(vecs[:,0]**2+vecs[:,2]**2)
+    alt = vecs_direction(dx,vecs[:,1],True)
+    return np.where(alt>pi, pi-alt, alt)
+
+
+def vecs_yRotate(vecs,angles):
+    """Return the vectors with direction change (y axis rotation) applied.
+
+    vecs_yRotate(array<vector>,array<float>) -> array<vector>
+    """
+    vecs = np.asarray(vecs,dtype=float)
+    c = np.cos(angles)
+    s = np.sin(angles)
+    out = np.empty(vecs.shape)
+    out[:,0] = c*vecs[:,0] + s*vecs[:,2]
+    out[:,1] = vecs[:,1]
+    out[:,2] = c*vecs[:,2] - s*vecs[:,0]
+    return out
+
+
+def vecs_zRotate(vecs,angles):
+    """Return the vectors with z axis rotation applied.
+
+    vecs_zRotate(array<vector>,array<float>) -> array<vector>
+    """
+    vecs = np.asarray(vecs,dtype=float)
+    c = np.cos(angles)
+    s = np.sin(angles)
+    out = np.empty(vecs.shape)
+    out[:,0] = c*vecs[:,0] - s*vecs[:,1]
+    out[:,1] = s*vecs[:,0] + c*vecs[:,1]
+    out[:,2] = vecs[:,2]
+    return out
+
+
+def vecs_branch(parent_vecs,splits,rotations,lengths):
+    """Batched vec_branch: create one vector split/rotated from each row of
+    parent_vecs.
+
+    vecs_branch(array<vector>,array<float>,array<float>,array<float>)
+        -> array<vector>
+    Preconditions: mag(parent_vecs[n])>0, for all n
+                   lengths>0
+    """
+    parent_vecs = np.asarray(parent_vecs,dtype=float).reshape(-1,3)
+    n = len(parent_vecs)
+    splits = np.broadcast_to(np.asarray(splits,dtype=float),(n,))
+    rotations = np.broadcast_to(np.asarray(rotations,dtype=float),(n,))
+    lengths = np.broadcast_to(np.asarray(lengths,dtype=float),(n,))
+    #branch state of rotation/split about a unit 'i' vector
+    R = lengths*np.sin(splits)
+    vecs_ini = np.empty((n,3))
+    vecs_ini[:,0] = lengths*np.cos(splits)
+    vecs_ini[:,1] = R*np.cos(rotations)
+    vecs_ini[:,2] = R*np.sin(rotations)
+    #rotate about z-axis (vertical orientation), then about xz plane
+    vecs_ini = vecs_zRotate(vecs_ini,vecs_alt(parent_vecs))
+    return vecs_yRotate(vecs_ini,vecs_dir(parent_vecs))
+
+
+
+#instrumentation probes (see instrument.py)
+probe(globals(), 'direction')
+probe(globals(), 'vec_branch',
+      counts=lambda result, *args: {'branch vectors': 1})
+probe(globals(), 'vecs_branch',
+      counts=lambda result, *args: {'branch vectors': len(result)})
 
 # ----------------------------------------------------------------------------